@@ -0,0 +1,98 @@
+"""Benchmark selecting a cohort of subjects with several query clauses.
+
+A BIDS folder with the requested numbers of subjects is generated and loaded.
+A cohort is selected with four clauses (an age range, a number of sessions, a
+task and a sidecar value) by chaining `query` calls in the order they are
+written, and by passing all the clauses to a single
+:meth:`bidshandler.BIDSTree.query` call, which evaluates the cheapest and most
+selective clauses first. A new BIDSTree is loaded for each repeat so that no
+index or sidecar file is reused between repeats.
+
+Usage: python benchmarks/bench_cohort_query.py [--subjects 1000 4000]
+"""
+import argparse
+import os
+import os.path as op
+import tempfile
+import time
+
+from bidshandler import BIDSTree
+
+CLAUSES = [('age', '>=', 30), ('sessions', '=', 1),
+           ('PowerLineFrequency', '=', 60), ('task', '=', 'noise')]
+
+
+def make_folder(root, n_subjects):
+    """Create a BIDS folder containing `n_subjects` subjects.
+
+    Every subject has a `rest` task recorded with a power line frequency of
+    50 Hz, and every tenth subject also has a `noise` task recorded at 60 Hz.
+    """
+    project = op.join(root, 'project')
+    os.makedirs(project)
+    with open(op.join(project, 'participants.tsv'), 'w') as f:
+        f.write('participant_id\tage\n')
+        for sub in range(n_subjects):
+            f.write('sub-{0:05d}\t{1}\n'.format(sub, 20 + sub % 40))
+    for sub in range(n_subjects):
+        sub_id = 'sub-{0:05d}'.format(sub)
+        func = op.join(project, sub_id, 'ses-1', 'func')
+        os.makedirs(func)
+        tasks = [('rest', 50)]
+        if sub % 10 == 0:
+            tasks.append(('noise', 60))
+        for task, frequency in tasks:
+            name = '{0}_ses-1_task-{1}_bold'.format(sub_id, task)
+            open(op.join(func, name + '.nii'), 'w').close()
+            with open(op.join(func, name + '.json'), 'w') as f:
+                f.write('{{"PowerLineFrequency": {0}}}'.format(frequency))
+
+
+def query_chained(tree):
+    """Select the cohort by chaining one query for each clause."""
+    data = tree.query('subject', *CLAUSES[0])
+    for clause in CLAUSES[1:]:
+        data = data.query('subject', *clause)
+    return data
+
+
+def query_clauses(tree):
+    """Select the cohort with a single query."""
+    return tree.query('subject', CLAUSES)
+
+
+def timed(func, path, repeat):
+    """Shortest time taken to call `func` with a newly loaded BIDSTree."""
+    times = []
+    for _ in range(repeat):
+        tree = BIDSTree(path)
+        start = time.perf_counter()
+        func(tree)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--subjects', type=int, nargs='+',
+                        default=[1000, 4000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print('{0:>9} {1:>8} {2:>14} {3:>14} {4:>9}'.format(
+        'subjects', 'cohort', 'chained (s)', 'clauses (s)', 'speed-up'))
+    for n_subjects in args.subjects:
+        with tempfile.TemporaryDirectory() as tmp:
+            make_folder(tmp, n_subjects)
+            tree = BIDSTree(tmp)
+            cohort = query_clauses(tree)
+            assert list(cohort) == list(query_chained(tree))
+            t_chained = timed(query_chained, tmp, args.repeat)
+            t_clauses = timed(query_clauses, tmp, args.repeat)
+            print('{0:>9} {1:>8} {2:>14.5f} {3:>14.5f} {4:>8.1f}x'.format(
+                n_subjects, len(cohort), t_chained, t_clauses,
+                t_chained / t_clauses))
+
+
+if __name__ == '__main__':
+    main()
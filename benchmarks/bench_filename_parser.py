@@ -0,0 +1,82 @@
+"""Benchmark parsing BIDS file names.
+
+Every file name in a folder (by default the bids-examples test data) is
+parsed with the previous parser, the current parser without its cache and
+the current parser with a warm cache. Checking whether one name has all the
+entities of another is also compared between `_bids_params_are_subsets` and
+the `entities` of the parsed names.
+
+Usage: python benchmarks/bench_filename_parser.py [--path FOLDER]
+"""
+import argparse
+import os
+import os.path as op
+import timeit
+
+from bidshandler.constants import test_path
+from bidshandler.utils import _bids_params_are_subsets, _parse_bids_name
+
+
+def get_bids_params_old(fname):
+    """The previous implementation of `_get_bids_params`."""
+    filename, ext = op.splitext(fname)
+    f = filename.split('_')
+    data = {'ext': ext}
+    for i in f:
+        if '-' in i:
+            data[i.split('-')[0]] = i.split('-')[1]
+        else:
+            data['file'] = i
+    return data
+
+
+def folder_listings(path):
+    """Names of the contents of every folder within `path`."""
+    return [dirs + files for _, dirs, files in os.walk(path)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--path', default=op.join(test_path(),
+                                                  'bids-examples'))
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    listings = folder_listings(args.path)
+    fnames = [fname for listing in listings for fname in listing]
+    print('{0} names in {1} folders'.format(len(fnames), len(listings)))
+
+    uncached = _parse_bids_name.__wrapped__
+
+    def time(func):
+        return min(timeit.repeat(func, number=1, repeat=args.repeat))
+
+    results = [
+        ('previous parser', time(
+            lambda: [get_bids_params_old(fname) for fname in fnames])),
+        ('parser, no cache', time(
+            lambda: [uncached(fname) for fname in fnames])),
+        ('parser, warm cache', time(
+            lambda: [_parse_bids_name(fname) for fname in fnames])),
+    ]
+
+    # Compare the names in each folder with each other, as is done when the
+    # files associated with each scan are found.
+    pairs = [(a, b) for listing in listings for a in listing[:50] for b in
+             listing[:50]]
+    old_params = dict((fname, get_bids_params_old(fname)) for fname in
+                      fnames)
+    results.append(('subset check, dicts', time(
+        lambda: [_bids_params_are_subsets(old_params[a], old_params[b]) for
+                 a, b in pairs])))
+    results.append(('subset check, entities', time(
+        lambda: [_parse_bids_name(b).entities <=
+                 _parse_bids_name(a).entities for a, b in pairs])))
+
+    print('{0:<24} {1:>10}'.format('', 'time (ms)'))
+    for name, duration in results:
+        print('{0:<24} {1:>10.2f}'.format(name, duration * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Benchmark the time taken to import BIDSHandler.
+
+Each import is done in a new interpreter so that nothing is already cached in
+`sys.modules`. The time to import pandas, which BIDSHandler no longer imports,
+is shown for comparison.
+
+Usage: python benchmarks/bench_import.py [--repeat 10]
+"""
+import argparse
+import subprocess
+import sys
+
+_TIME_IMPORT = """
+import sys
+import time
+start = time.perf_counter()
+import {0}
+print(time.perf_counter() - start, 'pandas' in sys.modules)
+"""
+
+
+def time_import(module):
+    """Import a module in a new interpreter.
+
+    Returns
+    -------
+    tuple of (float, bool)
+        The time taken to import the module and whether pandas was imported.
+    """
+    output = subprocess.check_output(
+        [sys.executable, '-c', _TIME_IMPORT.format(module)],
+        universal_newlines=True)
+    duration, pandas_imported = output.split()
+    return float(duration), pandas_imported == 'True'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    print('{0:>12} {1:>10} {2:>10} {3:>16}'.format(
+        'module', 'best (s)', 'mean (s)', 'imports pandas'))
+    for module in ('bidshandler', 'pandas'):
+        times = []
+        for _ in range(args.repeat):
+            duration, pandas_imported = time_import(module)
+            times.append(duration)
+        print('{0:>12} {1:>10.4f} {2:>10.4f} {3:>16}'.format(
+            module, min(times), sum(times) / len(times), str(pandas_imported)))
+
+
+if __name__ == '__main__':
+    main()
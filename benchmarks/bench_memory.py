@@ -0,0 +1,130 @@
+"""Benchmark the memory used by each loaded Scan.
+
+A BIDS folder with the requested number of functional scans is generated and
+loaded. The memory used by the Scans (including the strings, tuples and
+dictionaries they refer to, with any objects shared between Scans only
+counted once) is compared with the memory that would be used by the same
+information stored in the previous layout, where each Scan had a `__dict__`,
+its own copy of every entity string and a dictionary of associated files.
+
+Usage: python benchmarks/bench_memory.py [--scans 1000 10000]
+"""
+import argparse
+import gc
+import os
+import os.path as op
+import sys
+import tempfile
+
+from bidshandler import BIDSTree
+
+# Number of runs in each session of the generated folder.
+RUNS = 10
+
+
+def make_folder(root, n_scans):
+    """Create a BIDS folder containing `n_scans` functional scans."""
+    project = op.join(root, 'project')
+    os.makedirs(project)
+    with open(op.join(project, 'participants.tsv'), 'w') as f:
+        f.write('participant_id\n')
+        for sub in range(n_scans // RUNS):
+            f.write('sub-{0:04d}\n'.format(sub))
+    # Inherited by every scan.
+    with open(op.join(project, 'task-rest_physio.json'), 'w') as f:
+        f.write('{}')
+    for sub in range(n_scans // RUNS):
+        sub_id = 'sub-{0:04d}'.format(sub)
+        func = op.join(project, sub_id, 'ses-1', 'func')
+        os.makedirs(func)
+        scans_tsv = op.join(project, sub_id, 'ses-1',
+                            '{0}_ses-1_scans.tsv'.format(sub_id))
+        with open(scans_tsv, 'w') as tsv:
+            tsv.write('filename\tacq_time\n')
+            for run in range(1, RUNS + 1):
+                name = '{0}_ses-1_task-rest_run-{1}'.format(sub_id, run)
+                for suffix in ('_bold.nii', '_bold.json', '_events.tsv'):
+                    open(op.join(func, name + suffix), 'w').close()
+                tsv.write('func/{0}_bold.nii\t2019-01-01T12:00:{1:02d}\n'
+                          .format(name, run))
+
+
+def _copy(value):
+    """Copy of a string which isn't shared with any other string."""
+    if isinstance(value, str):
+        return (value + '.')[:-1]
+    return value
+
+
+class DictScan():
+    """A Scan stored in the previous layout."""
+    def __init__(self, scan):
+        self._path = _copy(scan._path)
+        self._raw_file = scan._raw_file
+        self.acq_time = scan.acq_time
+        # The scan parameters were the keyword arguments of the Scan with
+        # `acq_time` removed.
+        self.scan_params = dict(acq_time=scan.acq_time, **scan.scan_params)
+        self.scan_params.pop('acq_time')
+        self.session = scan.session
+        self.task = _copy(scan.task)
+        self.run = _copy(scan.run)
+        self.acquisition = self.acq = _copy(scan.acq)
+        self.proc = _copy(scan.proc)
+        self._sidecar = scan._sidecar
+        self._queryable_types = ('scan',)
+        self._associated_files = dict(
+            (_copy(key), _copy(value)) for key, value in
+            scan.associated_files.items())
+        self._info = scan._info
+        self._extras_loaded = scan._extras_loaded
+        self._info_mtime = scan._info_mtime
+        self._extras_mtime = scan._extras_mtime
+
+
+def deep_size(objects, exclude):
+    """Total size of some objects and everything they refer to.
+
+    Any object referred to by more than one of the objects is only counted
+    once. Classes, modules and the objects in `exclude` aren't counted.
+    """
+    seen = set(id(obj) for obj in exclude)
+    size = 0
+    stack = list(objects)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, type):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scans', type=int, nargs='+',
+                        default=[1000, 10000])
+    args = parser.parse_args()
+
+    print('{0:>8} {1:>16} {2:>16} {3:>9}'.format(
+        'scans', 'before (B/scan)', 'after (B/scan)', 'saving'))
+    for n_scans in args.scans:
+        with tempfile.TemporaryDirectory() as tmp:
+            make_folder(tmp, n_scans)
+            tree = BIDSTree(tmp)
+            scans = tree.scans
+            for scan in scans:
+                # Make sure all the associated files have been found.
+                scan.associated_files
+            # The parent objects are the same for both layouts.
+            parents = [tree] + tree.projects + tree.subjects + tree.sessions
+            after = deep_size(scans, parents) / len(scans)
+            old_scans = [DictScan(scan) for scan in scans]
+            before = deep_size(old_scans, parents) / len(scans)
+            print('{0:>8} {1:>16.0f} {2:>16.0f} {3:>8.0%}'.format(
+                len(scans), before, after, 1 - after / before))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark numeric queries of participant information and sidecar values.
+
+A BIDS folder with the requested numbers of subjects is generated and loaded.
+`age > 30` (a participants.tsv column) and `RecordingDuration >= 300` (a
+sidecar value) are queried using the previous method, which compared the
+value of every Subject or Scan in turn, and using
+:meth:`bidshandler.BIDSTree.query`, which compares the participant
+information using NumPy arrays (if NumPy is installed) and bisects a sorted
+index of the sidecar values. The index and arrays are built by the first
+query, so the times are those of the queries made after it.
+
+Usage: python benchmarks/bench_numeric_query.py [--subjects 1000 10000]
+"""
+import argparse
+import os
+import os.path as op
+import tempfile
+import timeit
+
+from bidshandler import BIDSTree
+from bidshandler.utils import _compare
+
+QUERIES = [('subject', 'age', '>', 30),
+           ('scan', 'RecordingDuration', '>=', 300)]
+
+
+def make_folder(root, n_subjects):
+    """Create a BIDS folder containing `n_subjects` subjects."""
+    project = op.join(root, 'project')
+    os.makedirs(project)
+    with open(op.join(project, 'participants.tsv'), 'w') as f:
+        f.write('participant_id\tage\n')
+        for sub in range(n_subjects):
+            f.write('sub-{0:05d}\t{1}\n'.format(sub, 20 + sub % 40))
+    for sub in range(n_subjects):
+        sub_id = 'sub-{0:05d}'.format(sub)
+        func = op.join(project, sub_id, 'ses-1', 'func')
+        os.makedirs(func)
+        name = '{0}_ses-1_task-rest_bold'.format(sub_id)
+        open(op.join(func, name + '.nii'), 'w').close()
+        with open(op.join(func, name + '.json'), 'w') as f:
+            f.write('{{"RecordingDuration": {0}}}'.format(sub % 600))
+
+
+def query_old(tree, obj, token, condition, value):
+    """Query the tree in the same way as before."""
+    if obj == 'subject':
+        return [subject for subject in tree.subjects if
+                subject.subject_data.get(token) is not None and
+                _compare(subject.subject_data[token], condition, value)]
+    return [scan for scan in tree.scans if
+            scan.info.get(token) is not None and
+            _compare(scan.info[token], condition, value)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--subjects', type=int, nargs='+',
+                        default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print('{0:>9} {1:>28} {2:>12} {3:>12} {4:>9}'.format(
+        'subjects', 'query', 'before (s)', 'after (s)', 'speed-up'))
+    for n_subjects in args.subjects:
+        with tempfile.TemporaryDirectory() as tmp:
+            make_folder(tmp, n_subjects)
+            tree = BIDSTree(tmp)
+            for query in QUERIES:
+                assert query_old(tree, *query) == list(tree.query(*query))
+                # Don't use the cached results of the query.
+                tree._query_cache = None
+                t_old = min(timeit.repeat(lambda: query_old(tree, *query),
+                                          number=1, repeat=args.repeat))
+                t_new = min(timeit.repeat(
+                    lambda: tree._query(*query, combine='and'), number=1,
+                    repeat=args.repeat))
+                print('{0:>9} {1:>28} {2:>12.5f} {3:>12.5f} {4:>8.1f}x'.format(
+                    n_subjects, ' '.join(str(x) for x in query[1:]), t_old,
+                    t_new, t_old / t_new))
+
+
+if __name__ == '__main__':
+    main()
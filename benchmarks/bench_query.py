@@ -0,0 +1,91 @@
+"""Benchmark entity queries on a folder with thousands of subjects.
+
+A BIDS folder with the requested numbers of subjects is generated and loaded.
+Every subject has a `rest` task and every third subject also has a `noise`
+task. The `!!=` and `!=` conditions are timed using the previous method of
+answering them, which compared the entities of every Scan (and for `!!=`
+re-ran the `=` query and took the set difference once for every subject),
+and using :meth:`bidshandler.BIDSTree.query`. The index used by
+:meth:`bidshandler.BIDSTree.query` is built by the first query, so the times
+are those of the queries made after it. The cached results of the queries
+aren't used.
+
+Usage: python benchmarks/bench_query.py [--subjects 1000 2000]
+"""
+import argparse
+import os
+import os.path as op
+import tempfile
+import timeit
+
+from bidshandler import BIDSTree
+from bidshandler.utils import _compare
+
+
+def make_folder(root, n_subjects):
+    """Create a BIDS folder containing `n_subjects` subjects."""
+    project = op.join(root, 'project')
+    os.makedirs(project)
+    with open(op.join(project, 'participants.tsv'), 'w') as f:
+        f.write('participant_id\n')
+        for sub in range(n_subjects):
+            f.write('sub-{0:05d}\n'.format(sub))
+    for sub in range(n_subjects):
+        sub_id = 'sub-{0:05d}'.format(sub)
+        func = op.join(project, sub_id, 'ses-1', 'func')
+        os.makedirs(func)
+        tasks = ('rest', 'noise') if sub % 3 == 0 else ('rest',)
+        for task in tasks:
+            name = '{0}_ses-1_task-{1}_bold'.format(sub_id, task)
+            for ext in ('.nii', '.json'):
+                open(op.join(func, name + ext), 'w').close()
+
+
+def query_old(tree, token, condition, value):
+    """Query the subjects in the same way as before."""
+    subjects = tree.subjects
+    data = []
+    for subject in subjects:
+        if condition != '!!=':
+            for scan in subject.scans:
+                if _compare(getattr(scan, token), condition, value):
+                    data.append(subject)
+                    break
+        else:
+            has_subjects = query_old(tree, token, '=', value)
+            data.extend(list(set(subjects) - set(has_subjects)))
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--subjects', type=int, nargs='+',
+                        default=[1000, 2000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print('{0:>9} {1:>10} {2:>14} {3:>14} {4:>9}'.format(
+        'subjects', 'condition', 'before (s)', 'after (s)', 'speed-up'))
+    for n_subjects in args.subjects:
+        with tempfile.TemporaryDirectory() as tmp:
+            make_folder(tmp, n_subjects)
+            tree = BIDSTree(tmp)
+            for condition in ('!!=', '!='):
+                query = ('subject', 'task', condition, 'noise')
+                # The previous method returned each subject many times.
+                assert (set(query_old(tree, *query[1:])) ==
+                        set(tree.query(*query)))
+                t_old = min(timeit.repeat(
+                    lambda: query_old(tree, *query[1:]), number=1,
+                    repeat=args.repeat))
+                # Don't use the cached results of the query.
+                tree._query_cache = None
+                t_new = min(timeit.repeat(
+                    lambda: tree._query(*query, combine='and'), number=1,
+                    repeat=args.repeat))
+                print('{0:>9} {1:>10} {2:>14.5f} {3:>14.5f} {4:>8.0f}x'.format(
+                    n_subjects, condition, t_old, t_new, t_old / t_new))
+
+
+if __name__ == '__main__':
+    main()
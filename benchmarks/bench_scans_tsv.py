@@ -0,0 +1,77 @@
+"""Benchmark reading the rows of a scans.tsv file.
+
+Compares the previous method of reading the file with pandas and creating a
+Series for every row with the current method used by
+:meth:`bidshandler.Session._add_scans`.
+
+Usage: python benchmarks/bench_scans_tsv.py [--rows 100 1000 10000]
+"""
+import argparse
+import os.path as op
+import tempfile
+import timeit
+
+import pandas as pd
+
+from bidshandler.utils import _read_tsv
+
+
+def write_scans_tsv(fname, rows):
+    """Write a scans.tsv file with the specified number of rows."""
+    with open(fname, 'w') as f:
+        f.write('filename\tacq_time\tnotes\n')
+        for i in range(rows):
+            f.write('meg/sub-1_ses-1_task-test_run-{0}_meg.fif\t'
+                    '2019-01-01T12:{1:02d}:{2:02d}\tn/a\n'.format(
+                        i + 1, (i // 60) % 60, i % 60))
+
+
+def read_pandas_iloc(fname):
+    """Read the rows in the same way as before (one Series per row)."""
+    scans = pd.read_csv(fname, sep='\t')
+    rows = []
+    for i in range(len(scans)):
+        row = scans.iloc[i]
+        fname = row.pop('filename')
+        rows.append((fname, dict(row)))
+    return rows
+
+
+def read_records(fname):
+    """Read the rows in the same way as `Session._add_scans`."""
+    scans = _read_tsv(fname)
+    filenames = scans.pop('filename')
+    rows = []
+    for i, fname in enumerate(filenames):
+        rows.append((fname, dict((col_name, values[i]) for col_name, values
+                                 in scans.items())))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, nargs='+',
+                        default=[10, 100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print('{0:>8} {1:>14} {2:>14} {3:>9}'.format('rows', 'pandas iloc (s)',
+                                                 'records (s)', 'speed-up'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            fname = op.join(tmp, 'sub-1_ses-1_scans.tsv')
+            write_scans_tsv(fname, rows)
+            assert len(read_pandas_iloc(fname)) == len(read_records(fname))
+            number = max(1, 1000 // rows)
+            t_old = min(timeit.repeat(lambda: read_pandas_iloc(fname),
+                                      number=number,
+                                      repeat=args.repeat)) / number
+            t_new = min(timeit.repeat(lambda: read_records(fname),
+                                      number=number,
+                                      repeat=args.repeat)) / number
+            print('{0:>8} {1:>14.5f} {2:>14.5f} {3:>8.1f}x'.format(
+                rows, t_old, t_new, t_old / t_new))
+
+
+if __name__ == '__main__':
+    main()
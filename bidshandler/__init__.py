@@ -8,6 +8,7 @@ from .project import Project  # noqa
 from .subject import Subject  # noqa
 from .session import Session  # noqa
 from .scan import Scan  # noqa
+from .watcher import TreeWatcher  # noqa
 from .bidserrors import (NoProjectError, NoSubjectError, NoSessionError,  # noqa
                          NoScanError, IDError, MappingError, AssociationError)
 from .utils import download_test_data  # noqa
\ No newline at end of file
@@ -1,5 +1,7 @@
 import os
 import os.path as op
+import json
+from collections import OrderedDict
 import xml.etree.ElementTree as ET
 
 from .project import Project
@@ -7,8 +9,13 @@ from .subject import Subject
 from .session import Session
 from .scan import Scan
 from .querymixin import QueryMixin
-from .bidserrors import NoProjectError
-from .utils import _copyfiles, _realize_paths, _prettyprint_xml
+from .bidserrors import NoProjectError, MappingError
+from .watcher import TreeWatcher
+from .utils import (_copyfiles, _realize_paths, _prettyprint_xml, _scandir,
+                    _mtime, _invalidate_paths, _invalidate_queries)
+
+# Version of the format of the files written by `BIDSTree.save_index`.
+_INDEX_VERSION = 1
 
 
 class BIDSTree(QueryMixin):
@@ -19,18 +26,46 @@ class BIDSTree(QueryMixin):
     fpath : str or path-like object
         File path containing all the project folders organised using the BIDS
         specification.
-    initialize : bool, optional
+    initialize : bool | 'lazy', optional
         Whether to parse the folder and load any child structures.
+        If `'lazy'` only the project folders are parsed and every Subject,
+        Session and Scan is loaded the first time it is accessed (by
+        :meth:`bidshandler.Project.subject`, iteration, a query etc.).
+    workers : int, optional
+        Number of threads used to load the subjects of each Project.
+        Loading is mostly spent waiting on the file system so using a number
+        of threads can greatly reduce the load time of folders on network
+        storage. By default everything is loaded in the current thread.
+        Only the subjects are loaded on the threads; the sessions of each
+        Subject are loaded one after the other by the thread loading it.
+    index : str, optional
+        Path to an index file saved by :meth:`save_index`.
+        Any part of the folder which hasn't changed since the index was saved
+        is loaded from the index instead of the folder. If the file doesn't
+        exist the folder is loaded as usual.
     """
-    def __init__(self, fpath, initialize=True):
+    # Queries are answered using a QueryIndex of the contained Scans and the
+    # results of recent queries are cached.
+    _indexed = True
+
+    def __init__(self, fpath, initialize=True, workers=None, index=None):
         super(BIDSTree, self).__init__()
-        self.path = fpath
+        self._path = fpath
         self._projects = dict()
+        # Modification time of the folder when it was read.
+        self._mtime = None
+        # Whether projects only load their contents when they are accessed.
+        self._load_lazily = False
+        # Indexes of the contained scans. Only built when needed.
+        self._query_index = None
+        # Generation and results of recent queries.
+        self._query_cache = None
 
         self._queryable_types = ('project', 'subject', 'session', 'scan')
 
         if initialize:
-            self._add_projects()
+            self._add_projects(workers, lazy=(initialize == 'lazy'),
+                               index=self._read_index(index))
 
 #region public methods
 
@@ -124,6 +159,104 @@ class BIDSTree(QueryMixin):
             file.write(_prettyprint_xml(ET.tostring(root,
                                                     encoding='unicode')))
 
+    def refresh(self):
+        """Update the BIDSTree with any changes made to the folder.
+
+        Only the folders and files which were read when the objects were
+        loaded are checked for changes, using their modification times. Any
+        new projects, subjects or sessions are added, any which have been
+        removed are removed and any which have changed are reloaded.
+
+        Returns
+        -------
+        bool
+            Whether anything in the folder has changed since it was loaded.
+        """
+        changed = False
+        mtime = _mtime(self.path)
+        if mtime != self._mtime:
+            proj_ids = _scandir(self.path).dirs
+            self._mtime = mtime
+            for proj_id in list(self._projects.keys()):
+                if proj_id not in proj_ids:
+                    del self._projects[proj_id]
+            for proj_id in proj_ids:
+                if proj_id not in self._projects:
+                    try:
+                        self._projects[proj_id] = Project(
+                            proj_id, self,
+                            initialize=('lazy' if self._load_lazily else
+                                        True))
+                    except MappingError:
+                        # The project is probably still being written. Make
+                        # sure the folder is checked again next time.
+                        self._mtime = None
+            # Keep the projects in the same order as the folder.
+            self._projects = dict(
+                (proj_id, self._projects[proj_id]) for proj_id in proj_ids if
+                proj_id in self._projects)
+            _invalidate_queries()
+            changed = True
+        for project in self.projects:
+            changed = project.refresh() or changed
+        return changed
+
+    def save_index(self, fname):
+        """Save an index of the loaded folder.
+
+        The index contains everything needed to recreate the loaded objects,
+        including the contents of the scans.tsv and sidecar files, along with
+        the modification time of each file and folder when it was read.
+        Passing the index to :class:`bidshandler.BIDSTree` will then only
+        read the parts of the folder which have changed.
+
+        Parameters
+        ----------
+        fname : str
+            Path to save the index to.
+
+        Notes
+        -----
+        Any Subjects or Sessions which haven't been loaded yet (if the
+        BIDSTree was loaded with `initialize='lazy'`) are not included.
+        The sidecar of every included Scan is read so that its contents can
+        be saved.
+        """
+        index = OrderedDict([
+            ('version', _INDEX_VERSION),
+            ('projects', OrderedDict((project._id, project._to_index()) for
+                                     project in self.projects))])
+        dir_path = op.dirname(fname)
+        if dir_path != '':
+            if not op.exists(dir_path):
+                os.makedirs(dir_path)
+        with open(fname, 'w') as file:
+            json.dump(index, file)
+
+    def watch(self, interval=1.0, callback=None, use_inotify=None):
+        """Keep the BIDSTree in sync with the folder as it changes.
+
+        Parameters
+        ----------
+        interval : float, optional
+            Number of seconds between each check of the folder when polling.
+        callback : function, optional
+            Function called with the list of objects which have changed.
+        use_inotify : bool | None, optional
+            Whether to use inotify to be notified of changes. If None inotify
+            is used if it is available, otherwise the folder is polled.
+
+        Returns
+        -------
+        :class:`bidshandler.TreeWatcher`
+            The started watcher. Call its `stop` method (or use it as a
+            context manager) to stop watching the folder.
+        """
+        watcher = TreeWatcher(self, interval=interval, callback=callback,
+                              use_inotify=use_inotify)
+        watcher.start()
+        return watcher
+
     def project(self, id_):
         """Return the Project corresponding to the provided id."""
         try:
@@ -134,17 +267,70 @@ class BIDSTree(QueryMixin):
 
 #region private methods
 
-    def _add_projects(self):
-        """Add all the projects in the folder to the BIDS folder."""
+    def _add_projects(self, workers=None, lazy=False, index=None):
+        """Add all the projects in the folder to the BIDS folder.
+
+        Parameters
+        ----------
+        workers : int, optional
+            Number of threads used to load the subjects of each project.
+        lazy : bool, optional
+            Whether the projects should only load their contents the first
+            time they are accessed.
+        index : dict, optional
+            Contents of a saved index. Any projects in the index are loaded
+            from it where they haven't changed.
+        """
         projects = dict()
-        for f in os.listdir(self.path):
-            full_path = op.join(self.path, f)
-            if op.isdir(full_path):
-                projects[f] = Project(f, self)
+        initialize = 'lazy' if lazy else True
+        entries = index['projects'] if index is not None else dict()
+        self._mtime = _mtime(self.path)
+        self._load_lazily = lazy
+        for f in _scandir(self.path).dirs:
+            if f in entries:
+                projects[f] = Project._from_index(f, self, entries[f],
+                                                  workers=workers, lazy=lazy)
+            else:
+                projects[f] = Project(f, self, initialize=initialize,
+                                      workers=workers)
         self._projects = projects
 
+    @staticmethod
+    def _read_index(fname):
+        """Read an index saved by :meth:`save_index`.
+
+        Parameters
+        ----------
+        fname : str | None
+            Path to the index.
+
+        Returns
+        -------
+        dict | None
+            Contents of the index. If there is no index, or it was saved by an
+            incompatible version, this is None.
+        """
+        if fname is None or not op.exists(fname):
+            return None
+        with open(fname, 'r') as file:
+            index = json.load(file)
+        if index.get('version') != _INDEX_VERSION:
+            return None
+        return index
+
 #region properties
 
+    @property
+    def path(self):
+        """Path to the BIDS folder."""
+        return self._path
+
+    @path.setter
+    def path(self, fpath):
+        self._path = fpath
+        # The paths of all the contained objects will change.
+        _invalidate_paths()
+
     @property
     def projects(self):
         """List of all Projects contained in the BIDS folder."""
@@ -0,0 +1,81 @@
+from collections import namedtuple
+
+from .utils import _mtime, _parse_bids_name, _scandir
+
+# Parsed information about a single entry in a folder.
+# `params` is the read-only mapping of BIDS parameters of the name and `part`
+# is the value of its `part` entity. `entities` is the frozenset of the
+# (key, value) pairs of all the other entities.
+_FileRecord = namedtuple('_FileRecord',
+                         ['name', 'params', 'part', 'entities', 'is_dir'])
+
+
+class DirCache():
+    """Cache of folder contents used while loading a BIDS folder.
+
+    Each folder is only read from disk, and the BIDS parameters of the names
+    of its contents parsed, the first time it is requested. The cache is only
+    intended to live for as long as it takes to load some objects as it will
+    not see any changes made to the folders after they are first read.
+    """
+    def __init__(self):
+        self._listings = dict()
+        self._records = dict()
+        # The modification time of each folder when it was read.
+        self.mtimes = dict()
+
+#region public methods
+
+    def listdir(self, folder):
+        """Contents of a folder.
+
+        Parameters
+        ----------
+        folder : str
+            Path to the folder to read.
+
+        Returns
+        -------
+        :py:class:`bidshandler.utils._DirListing`
+            Named tuple with the lists of the names of the sub-directories
+            (`dirs`) and all other entries (`files`) within the folder.
+        """
+        listing = self._listings.get(folder)
+        if listing is None:
+            self.mtimes[folder] = _mtime(folder)
+            listing = _scandir(folder)
+            self._listings[folder] = listing
+        return listing
+
+    def records(self, folder):
+        """Parsed records of the contents of a folder.
+
+        Parameters
+        ----------
+        folder : str
+            Path to the folder to read.
+
+        Returns
+        -------
+        list of :py:class:`_FileRecord`
+            A record for each sub-directory followed by a record for each
+            other entry within the folder.
+        """
+        records = self._records.get(folder)
+        if records is None:
+            listing = self.listdir(folder)
+            fnames = listing.dirs + listing.files
+            n_dirs = len(listing.dirs)
+            records = [_make_record(fname, _parse_bids_name(fname), i < n_dirs)
+                       for i, fname in enumerate(fnames)]
+            self._records[folder] = records
+        return records
+
+
+def _make_record(fname, bids_name, is_dir):
+    """Create the record for a single folder entry."""
+    part = bids_name.params.get('part')
+    entities = bids_name.entities
+    if part is not None:
+        entities = entities - {('part', part)}
+    return _FileRecord(fname, bids_name.params, part, entities, is_dir)
@@ -0,0 +1,75 @@
+from threading import RLock
+
+# Placeholder for a value which hasn't been loaded yet.
+_NOT_LOADED = object()
+
+
+class LazyDict(dict):
+    """
+    Dictionary wrapper class which only creates the values of registered keys
+    the first time they are accessed.
+
+    Parameters
+    ----------
+    loader : function
+        Function with the call signature `loader(key)` which returns the value
+        for a key registered with :meth:`add_lazy`.
+    """
+    def __init__(self, loader):
+        super(LazyDict, self).__init__()
+        self._loader = loader
+        self._lock = RLock()
+
+#region public methods
+
+    def add_lazy(self, key):
+        """Register a key whose value will be loaded on first access."""
+        super(LazyDict, self).__setitem__(key, _NOT_LOADED)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def is_loaded(self, key):
+        """Whether the value for the key has been created yet."""
+        return super(LazyDict, self).__getitem__(key) is not _NOT_LOADED
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def loaded_values(self):
+        """List of the values which have been created so far.
+
+        Unlike :meth:`values` this will not cause any values to be loaded.
+        """
+        return [value for value in super(LazyDict, self).values() if
+                value is not _NOT_LOADED]
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        return super(LazyDict, self).pop(key, *default)
+
+    def values(self):
+        return [self[key] for key in self]
+
+#region class methods
+
+    def __getitem__(self, key):
+        value = super(LazyDict, self).__getitem__(key)
+        if value is _NOT_LOADED:
+            with self._lock:
+                # Another thread may have loaded the value while we waited.
+                value = super(LazyDict, self).__getitem__(key)
+                if value is _NOT_LOADED:
+                    value = self._loader(key)
+                    super(LazyDict, self).__setitem__(key, value)
+        return value
+
+    def __repr__(self):
+        return '<LazyDict, {0} of {1} loaded>'.format(
+            len(self.loaded_values()), len(self))
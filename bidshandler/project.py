@@ -1,15 +1,18 @@
 import os.path as op
 import os
-import pandas as pd
 from collections import OrderedDict
+from threading import RLock
 import xml.etree.ElementTree as ET
 
 from .subject import Subject
 from .session import Session
 from .scan import Scan
 from .querymixin import QueryMixin
+from .lazydict import LazyDict
 from .bidserrors import NoSubjectError, MappingError, AssociationError
-from .utils import _copyfiles, _realize_paths
+from .utils import (_copyfiles, _realize_paths, _scandir, _map_threaded,
+                    _mtime, _read_tsv, _write_tsv, _invalidate_queries,
+                    _PATH_GENERATION)
 
 
 class Project(QueryMixin):
@@ -21,10 +24,21 @@ class Project(QueryMixin):
         Id of the project. This is the name of the folder containing the data.
     bids_tree : :class:`bidshandler.BIDSTree`
         Parent BIDSTree object containing this Project.
-    initialize : bool, optional
+    initialize : bool | 'lazy', optional
         Whether to parse the folder and load any child structures.
+        If `'lazy'` the folder is parsed but each Subject is only loaded the
+        first time it is accessed.
+    workers : int, optional
+        Number of threads used to load the contained subjects.
+        By default the subjects are loaded one after the other.
+        The sessions of each Subject are loaded one after the other by the
+        thread loading it.
     """
-    def __init__(self, id_, bids_tree, initialize=True):
+    # Queries are answered using a QueryIndex of the contained Scans and the
+    # results of recent queries are cached.
+    _indexed = True
+
+    def __init__(self, id_, bids_tree, initialize=True, workers=None):
         super(Project, self).__init__()
         self._id = id_
         self.bids_tree = bids_tree
@@ -32,12 +46,33 @@ class Project(QueryMixin):
         self._participants_json = None
         self._description = None
         self._readme = None
-        self._subjects = dict()
+        self._subjects = LazyDict(self._load_subject)
+        # Paths of the files in the project folder. Only read when needed.
+        self._folder_files = None
+        # Names of the files in the project folder when it was last read to
+        # load or refresh the subjects.
+        self._listed_files = None
+        # Information about each participant in the participants.tsv keyed by
+        # participant id. Only read when needed.
+        self._participants = None
+        self._lock = RLock()
+        # Modification times of the project folder and participants.tsv when
+        # they were read.
+        self._mtime = None
+        self._participants_mtime = None
+        # Whether subjects are only loaded the first time they are accessed.
+        self._load_lazily = False
+        # Generation the path was found in and the path.
+        self._path_cache = None
+        # Indexes of the contained scans. Only built when needed.
+        self._query_index = None
+        # Generation and results of recent queries.
+        self._query_cache = None
 
         self._queryable_types = ('project', 'subject', 'session', 'scan')
 
         if initialize:
-            self._add_subjects()
+            self._add_subjects(workers, lazy=(initialize == 'lazy'))
             self._check()
 
 #region public methods
@@ -100,6 +135,9 @@ class Project(QueryMixin):
         else:
             raise TypeError("Cannot add a {0} object to a Subject".format(
                 type(other).__name__))
+        # Files may have been added to the project folder.
+        self._folder_files = None
+        _invalidate_queries()
 
     def contained_files(self):
         """Get the list of contained files.
@@ -118,6 +156,66 @@ class Project(QueryMixin):
             file_list.update(subject.contained_files())
         return file_list
 
+    def refresh(self):
+        """Update the Project with any changes made to the folder.
+
+        Any new subjects are added, any subjects whose folders have been
+        removed are removed, and any loaded subjects which have changed are
+        updated.
+
+        Returns
+        -------
+        bool
+            Whether anything in the project has changed since it was loaded.
+        """
+        changed = False
+        participants_path = op.join(self.path, 'participants.tsv')
+        if (self._participants is not None and
+                _mtime(participants_path) != self._participants_mtime):
+            # Update the information of all the loaded subjects.
+            with self._lock:
+                self._participants = self._load_participants()
+            for subject in self._subjects.loaded_values():
+                subject.subject_data.clear()
+                subject._load_subject_info()
+            _invalidate_queries()
+            changed = True
+
+        mtime = _mtime(self.path)
+        if mtime == self._mtime:
+            for subject in self._subjects.loaded_values():
+                changed = subject.refresh() or changed
+            return changed
+
+        listing = _scandir(self.path)
+        sub_ids = self._subject_ids(listing)
+        self._folder_files = tuple(_realize_paths(self, listing.files))
+        self._assign_files(listing.files)
+        self._mtime = mtime
+        # If the files which can be inherited have changed every subject
+        # needs to be reloaded.
+        files_changed = self._listed_files != tuple(listing.files)
+        self._listed_files = tuple(listing.files)
+        for sub_id in list(self._subjects.keys()):
+            if sub_id not in sub_ids:
+                del self._subjects[sub_id]
+            elif self._subjects.is_loaded(sub_id):
+                self._subjects[sub_id]._refresh(reload=files_changed)
+        for sub_id in sub_ids:
+            if sub_id in self._subjects:
+                continue
+            if self._load_lazily:
+                self._subjects.add_lazy(sub_id)
+                continue
+            try:
+                self._subjects[sub_id] = Subject(sub_id, self)
+            except MappingError:
+                # The subject is probably still being written. Make sure the
+                # folder is checked again next time.
+                self._mtime = None
+        _invalidate_queries()
+        return True
+
     def subject(self, id_):
         """Return the Subject in this project with the corresponding ID.
 
@@ -141,14 +239,102 @@ class Project(QueryMixin):
 
 #region private methods
 
-    def _add_subjects(self):
-        """Add all the subjects in the folder to the Project."""
-        for fname in os.listdir(self.path):
-            full_path = op.join(self.path, fname)
-            if op.isdir(full_path) and 'sub-' in fname:
-                sub_id = fname.split('-')[1]
-                self._subjects[sub_id] = Subject(sub_id, self)
-            elif fname == 'participants.tsv':
+    def _add_subjects(self, workers=None, lazy=False, index=None):
+        """Add all the subjects in the folder to the Project.
+
+        Parameters
+        ----------
+        workers : int, optional
+            Number of threads used to load the subjects.
+        lazy : bool, optional
+            Whether to only register the subjects so that they are loaded the
+            first time they are accessed.
+        index : dict, optional
+            Entry for the project from a saved index. Any subjects which
+            haven't changed since the index was saved are loaded from it.
+        """
+        mtime = _mtime(self.path)
+        if index is not None and index['mtime'] == mtime:
+            sub_ids = list(index['subjects'].keys())
+            files = index['files']
+        else:
+            listing = _scandir(self.path)
+            sub_ids = self._subject_ids(listing)
+            files = listing.files
+            if index is not None and set(files) != set(index['files']):
+                # The files inherited by the subjects may have changed.
+                index = None
+        self._mtime = mtime
+        self._load_lazily = lazy
+        self._folder_files = tuple(_realize_paths(self, files))
+        self._listed_files = tuple(files)
+        entries = index['subjects'] if index is not None else dict()
+        if index is not None and index['participants'] is not None:
+            participants = index['participants']
+            if participants['mtime'] == _mtime(op.join(self.path,
+                                                       'participants.tsv')):
+                self._participants = OrderedDict(
+                    (key, OrderedDict(value)) for key, value in
+                    participants['rows'].items())
+                self._participants_mtime = participants['mtime']
+
+        def _load(sub_id):
+            if entries.get(sub_id) is not None:
+                return Subject._from_index(sub_id, self, entries[sub_id])
+            return Subject(sub_id, self)
+
+        if lazy:
+            for sub_id in sub_ids:
+                self._subjects.add_lazy(sub_id)
+            # Any subjects in the index can be loaded straight away.
+            for sub_id in sub_ids:
+                if entries.get(sub_id) is not None:
+                    self._subjects[sub_id] = Subject._from_index(
+                        sub_id, self, entries[sub_id], lazy=True)
+        else:
+            subjects = _map_threaded(_load, sub_ids, workers)
+            for subject in subjects:
+                self._subjects[subject._id] = subject
+        self._assign_files(files)
+
+    def _add_participant(self, participant_id, data):
+        """Add a participant to the participants index.
+
+        Parameters
+        ----------
+        participant_id : str
+            Id of the participant (including the `'sub-'` prefix).
+        data : dict
+            Information about the participant keyed by column name.
+        """
+        if self._participants is None:
+            # The participants.tsv will have all the information when it is
+            # first read.
+            return
+        columns = list(self._participants.values())[0].keys() if \
+            len(self._participants) != 0 else []
+        new_columns = [key for key in data if key not in columns]
+        for row in self._participants.values():
+            for key in new_columns:
+                row[key] = float('nan')
+        row = OrderedDict((key, data.get(key, float('nan'))) for key in
+                          list(columns) + new_columns)
+        self._participants[participant_id] = row
+
+    def _assign_files(self, files):
+        """Find the project level files from the contents of the folder.
+
+        Parameters
+        ----------
+        files : list of str
+            Names of the files in the project folder.
+        """
+        self._participants_tsv = None
+        self._participants_json = None
+        self._description = None
+        self._readme = None
+        for fname in files:
+            if fname == 'participants.tsv':
                 self._participants_tsv = fname
             elif fname == 'participants.json':
                 self._participants_json = fname
@@ -162,6 +348,81 @@ class Project(QueryMixin):
         if len(self._subjects) == 0:
             raise MappingError
 
+    def _clear_caches(self):
+        """Clear any cached folder contents of this and all child objects."""
+        self._folder_files = None
+        for subject in self._subjects.loaded_values():
+            subject._clear_caches()
+
+    def _inherited_files(self):
+        """Paths of the files that can be inherited by child objects.
+
+        The project folder is only read the first time this is called.
+        """
+        if self._folder_files is None:
+            self._folder_files = tuple(
+                _realize_paths(self, _scandir(self.path).files))
+        return self._folder_files
+
+    def _load_participants(self):
+        """Read the participants.tsv into a dictionary of participants.
+
+        Returns
+        -------
+        participants : :py:class:`collections.OrderedDict`
+            Information about each participant keyed by participant id.
+            Each value is a dictionary of the other columns of the file.
+        """
+        participants = OrderedDict()
+        participant_path = op.join(self.path, 'participants.tsv')
+        self._participants_mtime = _mtime(participant_path)
+        if not op.exists(participant_path):
+            return participants
+        columns = _read_tsv(participant_path)
+        if 'participant_id' not in columns:
+            # temporary error... This means the file is bad.
+            raise MappingError
+        participant_ids = columns.pop('participant_id')
+        for i, participant_id in enumerate(participant_ids):
+            if participant_id not in participants:
+                participants[participant_id] = OrderedDict(
+                    (col_name, values[i]) for col_name, values in
+                    columns.items())
+        return participants
+
+    def _load_subject(self, sub_id):
+        """Load a lazily registered subject."""
+        return Subject(sub_id, self, initialize='lazy')
+
+    @staticmethod
+    def _from_index(id_, bids_tree, entry, workers=None, lazy=False):
+        """Create a Project from its entry in a saved index.
+
+        Parameters
+        ----------
+        id_ : str
+            Id of the project.
+        bids_tree : :class:`bidshandler.BIDSTree`
+            Parent BIDSTree.
+        entry : dict
+            Entry for the project generated by :meth:`_to_index`.
+        workers : int, optional
+            Number of threads used to load the subjects.
+        lazy : bool, optional
+            Whether any subjects which have changed since the index was saved
+            are only loaded the first time they are accessed.
+
+        Returns
+        -------
+        new_project : :class:`bidshandler.Project`
+            New Project. Only the subjects which have changed since the index
+            was saved are loaded from the folder.
+        """
+        new_project = Project(id_, bids_tree, initialize=False)
+        new_project._add_subjects(workers, lazy, index=entry)
+        new_project._check()
+        return new_project
+
     @staticmethod
     def _clone_into_bidstree(bids_tree, other):
         """Create a copy of the Project with a new parent BIDSTree.
@@ -189,11 +450,83 @@ class Project(QueryMixin):
         self._participants_tsv = 'participants.tsv'
         full_path = _realize_paths(self, self._participants_tsv)
         if not op.exists(full_path):
-            df = pd.DataFrame(
-                OrderedDict([('participant_id', [])]),
-                columns=['participant_id'])
-        df.to_csv(full_path, sep='\t', index=False, na_rep='n/a',
-                  encoding='utf-8')
+            _write_tsv(full_path, OrderedDict([('participant_id', [])]))
+
+    def _participant_info(self, participant_id):
+        """Information about a participant from the participants.tsv.
+
+        The participants.tsv is only read the first time this is called.
+
+        Parameters
+        ----------
+        participant_id : str
+            Id of the participant (including the `'sub-'` prefix).
+
+        Returns
+        -------
+        :py:class:`collections.OrderedDict`
+            Information about the participant keyed by column name. This will
+            be empty if the participant isn't in the participants.tsv.
+        """
+        if self._participants is None:
+            with self._lock:
+                if self._participants is None:
+                    self._participants = self._load_participants()
+        return self._participants.get(participant_id, OrderedDict())
+
+    def _subject_ids(self, listing):
+        """Find the ids of the subjects in the project folder.
+
+        Parameters
+        ----------
+        listing : :py:class:`bidshandler.utils._DirListing`
+            Contents of the project folder.
+
+        Returns
+        -------
+        list of str
+            Ids of the subjects.
+        """
+        return [fname.split('-')[1] for fname in listing.dirs if
+                'sub-' in fname]
+
+    def _to_index(self):
+        """Generate the entry for the Project in a saved index.
+
+        Returns
+        -------
+        dict
+            Information required to recreate the Project and all its loaded
+            Subjects without reading any files.
+        """
+        # Make sure the contents of the folder are known.
+        self._inherited_files()
+        participants = None
+        if (self._participants is not None and
+                self._participants_mtime is not None):
+            participants = {'mtime': self._participants_mtime,
+                            'rows': self._participants}
+        subjects = OrderedDict()
+        for sub_id in self._subjects:
+            if self._subjects.is_loaded(sub_id):
+                subjects[sub_id] = self._subjects[sub_id]._to_index()
+            else:
+                subjects[sub_id] = None
+        return {'mtime': self._mtime,
+                'files': [op.basename(fname) for fname in self._folder_files],
+                'participants': participants,
+                'subjects': subjects}
+
+    def _remove_participant(self, participant_id):
+        """Remove a participant from the participants index."""
+        if self._participants is not None:
+            self._participants.pop(participant_id, None)
+
+    def _rename_participant(self, old_id, new_id):
+        """Change the id of a participant in the participants index."""
+        if self._participants is not None:
+            if old_id in self._participants:
+                self._participants[new_id] = self._participants.pop(old_id)
 
     def _generate_map(self):
         """Generate a map of the Project.
@@ -227,12 +560,7 @@ class Project(QueryMixin):
     def inheritable_files(self):
         """List of files that are able to be inherited by child objects."""
         # TODO: make private?
-        files = []
-        for fname in os.listdir(self.path):
-            abs_path = _realize_paths(self, fname)
-            if op.isfile(abs_path):
-                files.append(abs_path)
-        return files
+        return list(self._inherited_files())
 
     @property
     def participants_json(self):
@@ -253,7 +581,11 @@ class Project(QueryMixin):
     @property
     def path(self):
         """Path to Project folder."""
-        return op.join(self.bids_tree.path, self.ID)
+        cached = self._path_cache
+        if cached is None or cached[0] != _PATH_GENERATION[0]:
+            cached = self._path_cache = (
+                _PATH_GENERATION[0], op.join(self.bids_tree.path, self.ID))
+        return cached[1]
 
     @property
     def readme(self):
@@ -342,12 +674,12 @@ class Project(QueryMixin):
     def __repr__(self):
         return '<Project, ID: {0}, {1} subject{2}, @ {3}>'.format(
             self.ID,
-            len(self.subjects),
-            ('s' if len(self.subjects) != 1 else ''),
+            len(self._subjects),
+            ('s' if len(self._subjects) != 1 else ''),
             self.path)
 
     def __str__(self):
         output = []
         output.append('ID: {0}'.format(self.ID))
-        output.append('Number of subjects: {0}'.format(len(self.subjects)))
+        output.append('Number of subjects: {0}'.format(len(self._subjects)))
         return '\n'.join(output)
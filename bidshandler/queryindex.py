@@ -0,0 +1,464 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from .utils import _compare, _parse_acq_time, _QUERY_GENERATION
+
+# The types of objects which contain Scans, in the order they are nested.
+_CONTAINER_TYPES = ('session', 'subject', 'project')
+
+# Largest integer which can be compared exactly as a float.
+_MAX_EXACT_INT = 2 ** 53
+
+# The Scan attribute each entity token is read from.
+_ENTITY_ATTRS = {'task': 'task', 'acquisition': 'acq', 'acq': 'acq',
+                 'run': 'run', 'proc': 'proc'}
+
+
+class QueryIndex():
+    """Indexes of the Scans contained in a BIDSTree or Project.
+
+    The indexes are built the first time they are needed and are only valid
+    for as long as no Scans are added, removed or changed. Use
+    :meth:`is_current` to determine whether this is still the case.
+
+    Parameters
+    ----------
+    scans : list of :class:`bidshandler.Scan`
+        All the Scans contained in the object.
+    subjects : list of :class:`bidshandler.Subject`
+        All the Subjects contained in the object.
+    """
+    def __init__(self, scans, subjects):
+        self.scans = scans
+        self.subjects = subjects
+        self.generation = _QUERY_GENERATION[0]
+        # The containing objects of each type in the same order as they are
+        # returned by the `sessions`, `subjects` and `projects` properties.
+        self._containers = dict((obj, []) for obj in _CONTAINER_TYPES)
+        session = subject = project = None
+        for scan in scans:
+            if scan.session is session:
+                continue
+            session = scan.session
+            self._containers['session'].append(session)
+            if session.subject is not subject:
+                subject = session.subject
+                self._containers['subject'].append(subject)
+                if subject.project is not project:
+                    project = subject.project
+                    self._containers['project'].append(project)
+        # Inverted indexes of each entity keyed by the entity attribute.
+        self._entities = dict()
+        # Sorted acquisition times and the positions of the Scans with them.
+        self._dates = None
+        # Indexes of the values in the sidecar files keyed by sidecar key.
+        self._sidecars = dict()
+        # Arrays of the numeric participant information keyed by column.
+        self._participants = dict()
+
+#region public methods
+
+    def date_query(self, obj, condition, value):
+        """Find the objects which contain Scans recorded at certain times.
+
+        Parameters
+        ----------
+        obj : str
+            The object type that should be returned.
+            This can be one of ('project', 'subject', 'session', 'scan')
+        condition : str
+            The comparison between the acquisition time of the Scans and
+            `value`.
+        value : :py:class:`datetime.date` | :py:class:`datetime.datetime`
+            The time to compare to. If a date is provided the acquisition
+            times are compared to the whole day.
+
+        Returns
+        -------
+        list
+            The Scans with an acquisition time which satisfies the condition,
+            or the objects which contain any such Scans, in the order they
+            are contained in the indexed object. Scans without an
+            acquisition time are never included.
+        """
+        times, positions = self._date_index()
+        if isinstance(value, datetime):
+            # The times equal to the value.
+            start = bisect_left(times, value)
+            stop = bisect_right(times, value)
+        else:
+            # The times on the day of the value.
+            day = datetime(value.year, value.month, value.day)
+            start = bisect_left(times, day)
+            stop = bisect_left(times, day + timedelta(days=1))
+        matches = []
+        for start, stop in _condition_ranges(condition, start, stop,
+                                             len(times)):
+            matches.extend(positions[start:stop])
+        matches.sort()
+        return self._containing(obj, matches)
+
+    def entity_count(self, token, value):
+        """Number of Scans with a value of an entity.
+
+        Parameters
+        ----------
+        token : str
+            The entity. This can be one of ('task', 'acquisition', 'acq',
+            'run', 'proc').
+        value : object
+            The (hashable) value of the entity.
+
+        Returns
+        -------
+        int
+            The number of Scans with the value.
+        """
+        index = self._entity_index(_ENTITY_ATTRS[token])
+        positions, _ = index.get(value, ((), None))
+        return len(positions)
+
+    def entity_query(self, obj, token, condition, value):
+        """Find the objects which contain Scans with an entity value.
+
+        Parameters
+        ----------
+        obj : str
+            The object type that should be returned.
+            This can be one of ('project', 'subject', 'session', 'scan')
+        token : str
+            The entity to query. This can be one of ('task', 'acquisition',
+            'acq', 'run', 'proc').
+        condition : str
+            Either '=' or '!='.
+        value : object
+            The (hashable) value of the entity.
+
+        Returns
+        -------
+        list
+            The Scans with a value of the entity which satisfies the
+            condition, or the objects which contain any such Scans, in the
+            order they are contained in the indexed object.
+        """
+        index = self._entity_index(_ENTITY_ATTRS[token])
+        if condition == '=':
+            positions, containers = index.get(value, ((), None))
+            if obj == 'scan':
+                return [self.scans[i] for i in positions]
+            matches = containers[obj] if containers is not None else ()
+        else:
+            if obj == 'scan':
+                positions, _ = index.get(value, ((), None))
+                excluded = set(positions)
+                return [scan for i, scan in enumerate(self.scans) if
+                        i not in excluded]
+            matches = set()
+            for other_value, (_, containers) in index.items():
+                if other_value != value:
+                    matches.update(containers[obj])
+        return [ob for ob in self._containers[obj] if ob in matches]
+
+    def participant_query(self, token, condition, value):
+        """Find the Subjects with a value of their participant information.
+
+        The values are compared all at once using NumPy, so this is only
+        possible if NumPy is installed and the value and every value in the
+        participants.tsv column are numbers.
+
+        Parameters
+        ----------
+        token : str
+            The name of the participants.tsv column.
+        condition : str
+            The comparison between the values and `value`.
+        value : int | float
+            The value to compare to.
+
+        Returns
+        -------
+        list of :class:`bidshandler.Subject` | None
+            The Subjects with a value which satisfies the condition, in the
+            order they are contained in the indexed object, or None if the
+            values can't be compared using NumPy.
+        """
+        if not _is_number(value) or not _is_exact_float(value):
+            return None
+        column = self._participant_column(token)
+        if column is None:
+            return None
+        values, present = column
+        mask = _compare(values, condition, value) & present
+        subjects = self.subjects
+        return [subjects[i] for i in mask.nonzero()[0].tolist()]
+
+    def sidecar_query(self, obj, key, condition, value):
+        """Find the objects which contain Scans with a sidecar value.
+
+        Parameters
+        ----------
+        obj : str
+            The object type that should be returned.
+            This can be one of ('project', 'subject', 'session', 'scan')
+        key : str
+            The key in the sidecar files.
+        condition : str
+            The comparison between the sidecar values and `value`.
+        value : object
+            The value to compare to.
+
+        Returns
+        -------
+        list
+            The Scans with a value for the key which satisfies the condition,
+            or the objects which contain any such Scans, in the order they
+            are contained in the indexed object. Scans whose sidecar doesn't
+            have the key are never included.
+        """
+        numbers, number_positions, strings, others = self._sidecar_index(key)
+        matches = []
+        if _is_number(value):
+            start = bisect_left(numbers, value)
+            stop = bisect_right(numbers, value)
+            for start, stop in _condition_ranges(condition, start, stop,
+                                                 len(numbers)):
+                matches.extend(number_positions[start:stop])
+        else:
+            matches.extend(i for number, i in zip(numbers, number_positions)
+                           if _compare(number, condition, value))
+        if isinstance(value, str) and condition in ('=', '=='):
+            matches.extend(strings.get(value, ()))
+        else:
+            # Each distinct string only needs to be compared once.
+            for string, positions in strings.items():
+                if _compare(string, condition, value):
+                    matches.extend(positions)
+        matches.extend(i for other, i in others if
+                       _compare(other, condition, value))
+        matches.sort()
+        return self._containing(obj, matches)
+
+    def is_current(self):
+        """Whether the indexed Scans may have changed since it was built."""
+        return self.generation == _QUERY_GENERATION[0]
+
+#region private methods
+
+    def _containing(self, obj, positions):
+        """The Scans at some positions or the objects containing them.
+
+        Parameters
+        ----------
+        obj : str
+            The object type that should be returned.
+            This can be one of ('project', 'subject', 'session', 'scan')
+        positions : list of int
+            Sorted positions of the Scans.
+
+        Returns
+        -------
+        list
+            The Scans, or the objects which contain any of them, in the order
+            they are contained in the indexed object.
+        """
+        if obj == 'scan':
+            return [self.scans[i] for i in positions]
+        matches = set()
+        for i in positions:
+            session = self.scans[i].session
+            if obj == 'session':
+                matches.add(session)
+            elif obj == 'subject':
+                matches.add(session.subject)
+            else:
+                matches.add(session.subject.project)
+        return [ob for ob in self._containers[obj] if ob in matches]
+
+    def _date_index(self):
+        """Sorted acquisition times of the Scans.
+
+        Returns
+        -------
+        times : list of :py:class:`datetime.datetime`
+            The acquisition time of every Scan which has one, in ascending
+            order.
+        positions : list of int
+            The position of the Scan with each time.
+        """
+        if self._dates is None:
+            dates = []
+            for i, scan in enumerate(self.scans):
+                acq_time = _parse_acq_time(scan.acq_time)
+                if acq_time is not None:
+                    dates.append((acq_time, i))
+            dates.sort()
+            self._dates = ([acq_time for acq_time, _ in dates],
+                           [i for _, i in dates])
+        return self._dates
+
+    def _entity_index(self, attr):
+        """Inverted index of the values of an entity.
+
+        Parameters
+        ----------
+        attr : str
+            Name of the Scan attribute containing the value of the entity.
+
+        Returns
+        -------
+        dict
+            The positions of the Scans with each value of the entity, and
+            the set of objects of each type containing them, keyed by value.
+        """
+        index = self._entities.get(attr)
+        if index is not None:
+            return index
+        index = dict()
+        for i, scan in enumerate(self.scans):
+            value = getattr(scan, attr)
+            entry = index.get(value)
+            if entry is None:
+                entry = index[value] = (
+                    [], dict((obj, set()) for obj in _CONTAINER_TYPES))
+            entry[0].append(i)
+            containers = entry[1]
+            session = scan.session
+            containers['session'].add(session)
+            containers['subject'].add(session.subject)
+            containers['project'].add(session.subject.project)
+        self._entities[attr] = index
+        return index
+
+    def _participant_column(self, token):
+        """Array of the values of a participants.tsv column.
+
+        Parameters
+        ----------
+        token : str
+            The name of the participants.tsv column.
+
+        Returns
+        -------
+        values : :py:class:`numpy.ndarray`
+            The value of every Subject as a float. The value of any Subject
+            without a value is 0.
+        present : :py:class:`numpy.ndarray`
+            Whether each Subject has a value.
+        None
+            If NumPy isn't installed or any of the values isn't a number.
+        """
+        if token in self._participants:
+            return self._participants[token]
+        column = None
+        try:
+            import numpy as np
+        except ImportError:
+            pass
+        else:
+            values = []
+            present = []
+            for subject in self.subjects:
+                value = subject.subject_data.get(token, None)
+                if value is None:
+                    values.append(0)
+                    present.append(False)
+                elif _is_exact_float(value):
+                    values.append(value)
+                    present.append(True)
+                else:
+                    break
+            else:
+                column = (np.array(values, dtype=float),
+                          np.array(present, dtype=bool))
+        self._participants[token] = column
+        return column
+
+    def _sidecar_index(self, key):
+        """Index of the values of a key in the sidecar files of the Scans.
+
+        Parameters
+        ----------
+        key : str
+            The key in the sidecar files.
+
+        Returns
+        -------
+        numbers : list of int | float
+            The numeric values in ascending order.
+        number_positions : list of int
+            The position of the Scan with each numeric value.
+        strings : dict
+            The positions of the Scans with each string value keyed by
+            value.
+        others : list of tuple
+            The (value, position) of every other value.
+        """
+        index = self._sidecars.get(key)
+        if index is not None:
+            return index
+        numbers = []
+        strings = dict()
+        others = []
+        for i, scan in enumerate(self.scans):
+            value = scan.info.get(key, None)
+            if value is None:
+                continue
+            if _is_number(value):
+                numbers.append((value, i))
+            elif isinstance(value, str):
+                strings.setdefault(value, []).append(i)
+            else:
+                others.append((value, i))
+        numbers.sort()
+        index = self._sidecars[key] = (
+            [number for number, _ in numbers], [i for _, i in numbers],
+            strings, others)
+        return index
+
+
+def _condition_ranges(condition, start, stop, length):
+    """Ranges of a sorted list which satisfy a condition.
+
+    Parameters
+    ----------
+    condition : str
+        The comparison between the items of the list and a value.
+    start : int
+        Position of the first item equal to the value.
+    stop : int
+        Position after the last item equal to the value.
+    length : int
+        Length of the list.
+
+    Returns
+    -------
+    tuple of tuple
+        The (start, stop) of each range of items which satisfy the
+        condition.
+    """
+    if condition == '<':
+        return ((0, start),)
+    elif condition in ('<=', '=<'):
+        return ((0, stop),)
+    elif condition in ('=', '=='):
+        return ((start, stop),)
+    elif condition in ('=>', '>='):
+        return ((start, length),)
+    elif condition == '>':
+        return ((stop, length),)
+    elif condition in ('!=', '!!='):
+        return ((0, start), (stop, length))
+    raise ValueError("Invalid conditional {0} entered".format(condition))
+
+
+def _is_exact_float(value):
+    """Whether a value is a number which is exactly represented by a float."""
+    if isinstance(value, float):
+        return True
+    return isinstance(value, int) and abs(value) <= _MAX_EXACT_INT
+
+
+def _is_number(value):
+    """Whether a value can be ordered along with any other number."""
+    # NaN isn't equal to or ordered relative to anything.
+    return isinstance(value, (int, float)) and value == value
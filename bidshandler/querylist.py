@@ -1,3 +1,7 @@
+# Marker for a QueryIterator without a result found in advance.
+_NO_RESULT = object()
+
+
 class QueryList(list):
     """
     List wrapper class to allow the list of return objects from a query to
@@ -9,7 +13,38 @@ class QueryList(list):
 
 #region public methods
 
-    def query(self, obj, token, condition, value):
+    def exists(self):
+        """Whether the list contains any objects."""
+        return len(self) != 0
+
+    def first(self):
+        """The first object in the list, or None if it is empty."""
+        if len(self) == 0:
+            return None
+        return self[0]
+
+    def iter_query(self, obj, token, condition=None, value=None,
+                   combine='and'):
+        """Lazily query every object in the list.
+
+        The same as :meth:`query`, except the objects in the list are only
+        queried as the results are iterated over. This allows queries to be
+        chained without creating a list of the results of each query, and
+        stops querying once no more results are needed (eg. by
+        :meth:`QueryIterator.first`).
+
+        See :meth:`query` for a description of the parameters.
+
+        Returns
+        -------
+        :py:class:`bidshandler.querylist.QueryIterator`
+            Iterator over the objects that satisfy the provided query
+            conditions.
+        """
+        return QueryIterator(_iter_query(self, obj, token, condition, value,
+                                         combine))
+
+    def query(self, obj, token, condition=None, value=None, combine='and'):
         """
         Query the BIDS object and return the appropriate data.
 
@@ -18,8 +53,10 @@ class QueryList(list):
         obj : str
             The object type that should be returned.
             This can be one of ('project', 'subject', 'session', 'scan')
-        token : str
-            The key to query for. This can be a value from the following list:
+        token : str | list of tuple
+            The key to query for, or a list of (token, condition, value)
+            clauses which are combined as specified by `combine`.
+            The token can be a value from the following list:
 
             - **task**: Corresponds to the `task` key in the BIDS filename.
             - **acquisition** or **acq**: Corresponds to the `acq` key in the
@@ -63,14 +100,100 @@ class QueryList(list):
             used, and must have a type appropriate for comparison if an
             inequality operator is used.
             Currently regex is not supported, but this may come in the future.
+        combine : str, optional
+            How a list of clauses provided as the `token` are combined.
+            Either 'and' to return the objects which satisfy every clause or
+            'or' to return the objects which satisfy any clause.
 
         Returns
         -------
         return_data : :py:class:`bidshandler.querylist.QueryList`
             List of objects that satisfy the provided query conditions.
+            Any object which is found by querying more than one of the
+            objects in the list is only included once.
         """
+        return QueryList(_iter_query(self, obj, token, condition, value,
+                                     combine))
+
+
+class QueryIterator():
+    """
+    Iterator over the results of a query which are only found as they are
+    needed.
+
+    Parameters
+    ----------
+    iterable : iterable
+        The results of the query.
+    """
+    def __init__(self, iterable):
+        self._iterator = iter(iterable)
+        # The next result if it has been found by `exists`.
+        self._next = _NO_RESULT
+
+#region public methods
 
-        return_data = QueryList()
-        for BIDSobj in self:
-            return_data.extend(BIDSobj.query(obj, token, condition, value))
-        return return_data
+    def exists(self):
+        """Whether there are any more results.
+
+        The next result is found if required but isn't consumed.
+        """
+        if self._next is _NO_RESULT:
+            self._next = next(self._iterator, _NO_RESULT)
+        return self._next is not _NO_RESULT
+
+    def first(self):
+        """The next result, or None if there are no more results."""
+        return next(self, None)
+
+    def iter_query(self, obj, token, condition=None, value=None,
+                   combine='and'):
+        """Lazily query every remaining result.
+
+        See :meth:`QueryList.iter_query`.
+        """
+        return QueryIterator(_iter_query(self, obj, token, condition, value,
+                                         combine))
+
+    def query(self, obj, token, condition=None, value=None, combine='and'):
+        """Query every remaining result.
+
+        See :meth:`QueryList.query`.
+        """
+        return QueryList(_iter_query(self, obj, token, condition, value,
+                                     combine))
+
+#region class methods
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._next is not _NO_RESULT:
+            result, self._next = self._next, _NO_RESULT
+            return result
+        return next(self._iterator)
+
+
+def _iter_query(objects, obj, token, condition, value, combine):
+    """Query a number of objects, yielding each result once.
+
+    Parameters
+    ----------
+    objects : iterable
+        The objects to query.
+    obj, token, condition, value, combine
+        See :meth:`bidshandler.querymixin.QueryMixin.query`.
+
+    Yields
+    ------
+    object
+        Each object found by querying any of the `objects`. Objects are
+        compared by identity, as Scans can't be hashed.
+    """
+    found = set()
+    for bids_obj in objects:
+        for result in bids_obj.query(obj, token, condition, value, combine):
+            if id(result) not in found:
+                found.add(id(result))
+                yield result
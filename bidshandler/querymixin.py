@@ -1,7 +1,21 @@
+import os.path as op
+from collections import OrderedDict
 from datetime import datetime
 
-from .utils import _compare, _compare_times
+from .utils import (_compare, _compare_times, _get_bids_params,
+                    _parse_acq_time, _QUERY_GENERATION)
 from .querylist import QueryList
+from .queryindex import QueryIndex
+
+# Tokens which are the number of contained objects.
+_COUNT_TOKENS = ('subjects', 'sessions', 'scans')
+# Tokens which are entities in the file names of scans.
+_ENTITY_TOKENS = ('task', 'acquisition', 'run', 'proc', 'acq')
+# Tokens which are answered from a QueryIndex without reading any files.
+_INDEXED_TOKENS = _ENTITY_TOKENS + ('rec_date',)
+
+# Maximum number of query results cached by each BIDSTree or Project.
+_QUERY_CACHE_SIZE = 128
 
 
 class QueryMixin():
@@ -10,10 +24,15 @@ class QueryMixin():
     This Mix-in class has no functionality on its own and can only be used
     as a sub-class.
     """
+    # Allow sub-classes to define __slots__.
+    __slots__ = ()
+    # Whether the object keeps a QueryIndex of its Scans in `_query_index`
+    # and caches the results of queries in `_query_cache`.
+    _indexed = False
 
 #region public methods
 
-    def query(self, obj, token, condition, value):
+    def query(self, obj, token, condition=None, value=None, combine='and'):
         """
         Query the BIDS object and return the appropriate data.
 
@@ -22,8 +41,10 @@ class QueryMixin():
         obj : str
             The object type that should be returned.
             This can be one of ('project', 'subject', 'session', 'scan')
-        token : str
-            The key to query for. This can be a value from the following list:
+        token : str | list of tuple
+            The key to query for, or a list of (token, condition, value)
+            clauses which are combined as specified by `combine`.
+            The token can be a value from the following list:
 
             - **task**: Corresponds to the `task` key in the BIDS filename.
             - **acquisition** or **acq**: Corresponds to the `acq` key in the
@@ -67,14 +88,45 @@ class QueryMixin():
             used, and must have a type appropriate for comparison if an
             inequality operator is used.
             Currently regex is not supported, but this may come in the future.
+        combine : str, optional
+            How a list of clauses provided as the `token` are combined.
+            Either 'and' to return the objects which satisfy every clause or
+            'or' to return the objects which satisfy any clause.
+            The clauses are evaluated with the cheapest and most selective
+            first, and for 'and' any other clauses which can't be answered
+            from an index are only evaluated for the objects which satisfy
+            the earlier clauses.
 
         Returns
         -------
         return_data : :py:class:`bidshandler.querylist.QueryList`
             List of objects that satisfy the provided query conditions.
         """
+        cache = self._current_query_cache()
+        key = None
+        if cache is not None:
+            key = _query_key(obj, token, condition, value, combine)
+        if key is None:
+            return self._query(obj, token, condition, value, combine)
+        data = cache.get(key)
+        if data is None:
+            data = cache[key] = tuple(self._query(obj, token, condition,
+                                                  value, combine))
+            if len(cache) > _QUERY_CACHE_SIZE:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
+        return QueryList(data)
+
+    def _query(self, obj, token, condition, value, combine):
+        """Query the object without using any cached results.
+
+        See :meth:`query` for a description of the parameters.
+        """
         if not self._allow_query(obj):
             raise ValueError('Invalid query')
+        if isinstance(token, (list, tuple)):
+            return self._query_clauses(obj, token, combine)
         return_data = QueryList()
         # each token will be handled separately
         if token == 'subjects':
@@ -113,10 +165,17 @@ class QueryMixin():
                 raise ValueError('Can only query the number of scans for a '
                                  'project, subject or session.')
             return_data.extend(data)
-        elif token in ('task', 'acquisition', 'run', 'proc', 'acq'):
+        elif token in _ENTITY_TOKENS:
             # condition can *only* be '=', '!=' or '!!='
             if condition not in ('=', '!=', '!!='):
                 raise ValueError('Condition can only be "=" or "!=", "!!="')
+            index = self._current_query_index()
+            if (index is not None and _is_hashable(value) and
+                    (condition != '!!=' or obj == 'scan')):
+                # A `!!=` condition for scans is the same as `!=`.
+                return_data.extend(index.entity_query(
+                    obj, token, '=' if condition == '=' else '!=', value))
+                return return_data
             if obj == 'project':
                 iter_obj = self.projects
             elif obj == 'subject':
@@ -126,19 +185,20 @@ class QueryMixin():
             elif obj == 'scan':
                 iter_obj = None
             if iter_obj is not None:
+                if condition == '!!=':
+                    # Find the set of obj's that do have the value for the
+                    # token.
+                    has_objs = set(self.query(obj, token, '=', value))
+                    # Now find the inverse of this set.
+                    return_data.extend(ob for ob in iter_obj if
+                                       ob not in has_objs)
+                    return return_data
                 for ob in iter_obj:
-                    if condition != '!!=':
-                        for scan in ob.scans:
-                            if _compare(scan.__getattribute__(token),
-                                        condition, value):
-                                return_data.append(ob)
-                                break
-                    else:
-                        # Find the list of obj's that do have the value for the
-                        # token.
-                        has_objs = self.query(obj, token, '=', value)
-                        # Now find the inverse of this list.
-                        return_data.extend(list(set(iter_obj) - set(has_objs)))
+                    for scan in ob.scans:
+                        if _compare(scan.__getattribute__(token), condition,
+                                    value):
+                            return_data.append(ob)
+                            break
             else:
                 for scan in self.scans:
                     if _compare(scan.__getattribute__(token), condition,
@@ -152,6 +212,11 @@ class QueryMixin():
                 _compare_date = _compare_date.date()
             except ValueError:
                 _compare_date = datetime.strptime(value, "%Y-%m-%dT%H:%M:%S")
+            index = self._current_query_index()
+            if index is not None:
+                return_data.extend(index.date_query(obj, condition,
+                                                    _compare_date))
+                return return_data
             if obj == 'project':
                 iter_obj = self.projects
             elif obj == 'subject':
@@ -163,22 +228,47 @@ class QueryMixin():
             if iter_obj is not None:
                 for ob in iter_obj:
                     for scan in ob.scans:
-                        dt = scan.acq_time
                         # convert to datetime object
-                        dt = datetime.strptime(dt, "%Y-%m-%dT%H:%M:%S")
+                        dt = _parse_acq_time(scan.acq_time)
+                        if dt is None:
+                            continue
                         if _compare_times(dt, condition, _compare_date):
                             return_data.append(ob)
                             break
             else:
                 for scan in self.scans:
-                    dt = scan.acq_time
                     # convert to datetime object
-                    dt = datetime.strptime(dt, "%Y-%m-%dT%H:%M:%S")
+                    dt = _parse_acq_time(scan.acq_time)
+                    if dt is None:
+                        continue
                     if _compare_times(dt, condition, _compare_date):
                         return_data.append(scan)
         else:
             # We will assume any other value is a key in the sidecar.json
             # to allow these values to be searched for.
+            index = self._current_query_index()
+            if obj == 'subject':
+                # Try and find the specified value as a key in
+                # Subject.subject_data
+                data = None
+                if index is not None:
+                    data = index.participant_query(token, condition, value)
+                if data is not None:
+                    return_data.extend(data)
+                else:
+                    for ob in self.subjects:
+                        data = ob.subject_data.get(token, None)
+                        if data is not None:
+                            if _compare(data, condition, value):
+                                return_data.append(ob)
+            # If we happened to have found data then return it.
+            # Otherwise continue.
+            if len(return_data) != 0:
+                return return_data
+            if index is not None:
+                return_data.extend(index.sidecar_query(obj, token, condition,
+                                                       value))
+                return return_data
             if obj == 'project':
                 iter_obj = self.projects
             elif obj == 'subject':
@@ -187,18 +277,6 @@ class QueryMixin():
                 iter_obj = self.sessions
             elif obj == 'scan':
                 iter_obj = None
-            if obj == 'subject':
-                # Try and find the specified value as a key in
-                # Subject.subject_data
-                for ob in iter_obj:
-                    data = ob.subject_data.get(token, None)
-                    if data is not None:
-                        if _compare(data, condition, value):
-                            return_data.append(ob)
-            # If we happened to have found data then return it.
-            # Otherwise continue.
-            if len(return_data) != 0:
-                return return_data
             if iter_obj is not None:
                 for ob in iter_obj:
                     for scan in ob.scans:
@@ -215,8 +293,165 @@ class QueryMixin():
                             return_data.append(scan)
         return return_data
 
+    def to_table(self, sidecar_keys=None, dataframe=False):
+        """Generate a table with a row for every contained Scan.
+
+        Parameters
+        ----------
+        sidecar_keys : list of str, optional
+            Keys of the sidecar files to include as columns. The sidecar
+            files are only read if any keys are requested.
+        dataframe : bool, optional
+            Whether to return a :py:class:`pandas.DataFrame` instead of a
+            dictionary of columns. pandas is only imported if this is True.
+
+        Returns
+        -------
+        :py:class:`collections.OrderedDict` | :py:class:`pandas.DataFrame`
+            The table as lists of values keyed by column name. The columns
+            are `project`, `subject`, `session`, `modality`, one column for
+            each BIDS entity in the raw file names (eg. `task` and `run`),
+            `acq_time` (as a :py:class:`datetime.datetime`), `raw_file`,
+            one column for each column of the participants.tsv files and one
+            column for each of the `sidecar_keys`. Any value a Scan doesn't
+            have is None. If a participants.tsv column has the same name as
+            an earlier column it isn't included.
+        """
+        fixed_names = ('project', 'subject', 'session', 'modality')
+        fixed = OrderedDict((name, []) for name in fixed_names)
+        entities = OrderedDict()
+        acq_times = []
+        raw_files = []
+        participants = OrderedDict()
+        sidecar = OrderedDict((key, []) for key in sidecar_keys or ())
+        n_rows = 0
+        session = None
+        for scan in self.scans:
+            if scan.session is not session:
+                # These values are the same for every scan in the session.
+                session = scan.session
+                subject = session.subject
+                session_values = (subject.project.ID, subject.ID, session.ID)
+                subject_data = subject.subject_data
+                session_path = session.path
+            for column, value in zip(fixed.values(), session_values):
+                column.append(value)
+            fixed['modality'].append(scan.scan_type)
+            params = _get_bids_params(op.basename(scan._raw_file))
+            for key in ('file', 'ext', 'sub', 'ses'):
+                params.pop(key, None)
+            _add_row(entities, params, n_rows)
+            acq_times.append(_parse_acq_time(scan.acq_time))
+            raw_files.append(op.join(session_path, scan.raw_file_relative))
+            _add_row(participants, subject_data, n_rows)
+            if sidecar:
+                info = scan.info
+                for key, column in sidecar.items():
+                    column.append(info.get(key))
+            n_rows += 1
+
+        table = fixed
+        table.update(entities)
+        table['acq_time'] = acq_times
+        table['raw_file'] = raw_files
+        for name, column in participants.items():
+            if name not in table:
+                table[name] = column
+        table.update(sidecar)
+        if dataframe:
+            import pandas as pd
+            return pd.DataFrame(table)
+        return table
+
 #region private methods
 
+    def _current_query_cache(self):
+        """The up to date cache of the results of queries of the object.
+
+        Returns
+        -------
+        :py:class:`collections.OrderedDict` | None
+            The results of the most recent queries, keyed by the arguments of
+            each query, with the most recently used last. The cache is
+            emptied if any Scans may have changed since the results were
+            found. None if the object doesn't cache any results.
+        """
+        if not self._indexed:
+            return None
+        cache = self._query_cache
+        if cache is None or cache[0] != _QUERY_GENERATION[0]:
+            cache = self._query_cache = (_QUERY_GENERATION[0], OrderedDict())
+        return cache[1]
+
+    def _current_query_index(self):
+        """The up to date :class:`QueryIndex` of the contained Scans.
+
+        Returns
+        -------
+        :class:`bidshandler.queryindex.QueryIndex` | None
+            The index, which is built if it doesn't exist or the Scans may
+            have changed since it was built, or None if the object doesn't
+            keep an index.
+        """
+        if not self._indexed:
+            return None
+        index = self._query_index
+        if index is None or not index.is_current():
+            index = QueryIndex(self.scans, self.subjects)
+            self._query_index = index
+        return index
+
+    def _query_clauses(self, obj, clauses, combine):
+        """Find the objects which satisfy a number of query clauses.
+
+        Parameters
+        ----------
+        obj : str
+            The object type that should be returned.
+            This can be one of ('project', 'subject', 'session', 'scan')
+        clauses : list of tuple
+            The (token, condition, value) of each clause.
+        combine : str
+            Either 'and' or 'or'.
+
+        Returns
+        -------
+        :py:class:`bidshandler.querylist.QueryList`
+            The objects which satisfy the clauses in the order they are
+            contained.
+        """
+        if combine not in ('and', 'or'):
+            raise ValueError('combine can only be "and" or "or"')
+        if len(clauses) == 0:
+            raise ValueError('No query clauses provided')
+        index = self._current_query_index()
+        clauses = sorted((tuple(clause) for clause in clauses),
+                         key=lambda clause: _clause_cost(clause, index))
+        objects = getattr(self, obj + 's')
+        if combine == 'or':
+            matches = dict()
+            for clause in clauses:
+                matches.update((id(ob), ob) for ob in self.query(obj, *clause))
+                if len(matches) == len(objects):
+                    break
+        else:
+            matches = None
+            for clause in clauses:
+                if matches is None or (index is not None and
+                                       clause[0] in _INDEXED_TOKENS):
+                    data = self.query(obj, *clause)
+                    if matches is not None:
+                        data = [ob for ob in data if id(ob) in matches]
+                    matches = dict((id(ob), ob) for ob in data)
+                else:
+                    # Only check the objects which satisfy every earlier
+                    # clause.
+                    matches = dict((id_, ob) for id_, ob in matches.items() if
+                                   len(ob.query(obj, *clause)) != 0)
+                if len(matches) == 0:
+                    break
+        return QueryList(ob for ob in objects if id(ob) in matches)
+
     def _allow_query(self, obj):
         """Determine whether the current class is able to process the query.
 
@@ -275,3 +510,90 @@ class QueryMixin():
 
     def __contains__(self, other):  # pragma: no cover
         pass
+
+
+def _add_row(columns, values, n_rows):
+    """Add a row to a table where not every row has every column.
+
+    Parameters
+    ----------
+    columns : :py:class:`collections.OrderedDict`
+        Lists of the values of the existing rows keyed by column name.
+        Columns are added for any new keys in `values`.
+    values : dict
+        Values of the new row keyed by column name. Any columns not in
+        `values` are given a value of None.
+    n_rows : int
+        Number of existing rows.
+    """
+    for name, value in values.items():
+        column = columns.get(name)
+        if column is None:
+            column = columns[name] = [None] * n_rows
+        column.append(value)
+    if len(values) != len(columns):
+        for column in columns.values():
+            if len(column) == n_rows:
+                column.append(None)
+
+
+def _clause_cost(clause, index):
+    """Estimated cost and selectivity of evaluating a query clause.
+
+    Parameters
+    ----------
+    clause : tuple
+        The (token, condition, value) of the clause.
+    index : :class:`bidshandler.queryindex.QueryIndex` | None
+        The index of the queried object.
+
+    Returns
+    -------
+    tuple
+        Key which sorts the clauses which are cheaper to evaluate, or which
+        are expected to match fewer objects, first.
+    """
+    token, condition, value = clause
+    if token in _ENTITY_TOKENS:
+        if index is not None and condition == '=' and _is_hashable(value):
+            # The number of matching scans is known from the index.
+            return (0, index.entity_count(token, value))
+        return (2, 0)
+    elif token in _COUNT_TOKENS:
+        return (1, 0)
+    elif token == 'rec_date':
+        return (2, 0)
+    # Participant information or sidecar values, which may need to be read
+    # from the sidecar files.
+    return (3, 0)
+
+
+def _is_hashable(value):
+    """Whether a value can be looked up in an index."""
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+def _query_key(obj, token, condition, value, combine):
+    """Key of the results of a query in a query cache.
+
+    Returns
+    -------
+    tuple | None
+        The arguments of the query, or None if they can't be used as a key.
+        The type of every value is included so that equal values of
+        different types (eg. 1 and True) aren't considered the same.
+    """
+    if isinstance(token, (list, tuple)):
+        try:
+            token = tuple((tuple(clause), type(clause[2])) for clause in
+                          token)
+        except (TypeError, IndexError):
+            return None
+    key = (obj, token, condition, value, type(value), combine)
+    if not _is_hashable(key):
+        return None
+    return key
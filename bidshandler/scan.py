@@ -1,19 +1,22 @@
 import os.path as op
 import os
-import json
+from types import MappingProxyType
 import xml.etree.ElementTree as ET
 from warnings import warn
 import shutil
 
-import pandas as pd
-
 from .querymixin import QueryMixin
-from .utils import (_get_bids_params, _realize_paths, _multi_replace,
-                    _bids_params_are_subsets, _splitall, _fix_folderless,
-                    _file_list, _reformat_fname)
+from .utils import (_realize_paths, _multi_replace, _splitall,
+                    _fix_folderless, _file_list, _reformat_fname, _mtime,
+                    _remove_tsv_rows, _intern, _load_json, _parse_bids_name,
+                    _invalidate_queries, _PATH_GENERATION)
+from .dircache import DirCache
 from .bidserrors import NoScanError
 from .constants import _SIDECAR_MAP
 
+# Information of a Scan without a sidecar.
+_NO_INFO = MappingProxyType(dict())
+
 
 class Scan(QueryMixin):
     """Scan-level object
@@ -28,32 +31,43 @@ class Scan(QueryMixin):
         A dictionary containing any number of other scan parameters specified
         by scans.tsv.
     """
+    # A large number of Scans may be loaded so they don't have a __dict__.
+    __slots__ = ('_path', '_raw_file', 'acq_time', '_param_keys',
+                 '_param_values', 'session', 'task', 'run', 'acq', 'proc',
+                 '_sidecar', '_file_keys', '_file_names', '_info',
+                 '_extras_loaded', '_info_mtime', '_extras_mtime',
+                 '_raw_file_path')
+
+    _queryable_types = ('scan',)
+
     def __init__(self, fpath, session, **scan_params):
         super(Scan, self).__init__()
         split_paths = _splitall(fpath)
         if len(split_paths) < 2:
             raise ValueError("Scan must be within a subfolder of the session.")
-        self._path = split_paths[0]
+        self._path = _intern(split_paths[0])
         sub_paths = split_paths[1:]
         if len(sub_paths) == 1:
             self._raw_file = sub_paths[0]
         elif len(sub_paths) > 1:
             self._raw_file = op.join(sub_paths[0], *sub_paths[1:])
+        # Generation the path of the raw file was found in and the path.
+        self._raw_file_path = None
         self.acq_time = scan_params.pop('acq_time', None)
         self.scan_params = scan_params
         self.session = session
         self._get_params()
         self._sidecar = None
 
-        self._queryable_types = ('scan',)
-
-        self.associated_files = dict()
         self._assign_metadata()
-        # Load information from the sidecar.
-        self.info = dict()
-        self._load_info()
-        # Finally we do any manufacturer specific loading.
-        self._load_extras()
+        # The sidecar and any manufacturer specific files are only loaded
+        # when they are first needed.
+        self._info = None
+        self._extras_loaded = False
+        # Modification times of the sidecar and the folder containing the raw
+        # file when they were read.
+        self._info_mtime = None
+        self._extras_mtime = None
 
 #region public methods
 
@@ -94,18 +108,17 @@ class Scan(QueryMixin):
 
         # remove the scan information from the scans.tsv
         if self.session.scans_tsv is not None:
-            df = pd.read_csv(self.session.scans_tsv, sep='\t')
-            row_idx = (df[df['filename'] ==
-                       _reformat_fname(self.raw_file_relative)].index.item())
-            df = df.drop(row_idx)
-            df.to_csv(self.session.scans_tsv, sep='\t', index=False,
-                      na_rep='n/a', encoding='utf-8')
+            _remove_tsv_rows(self.session.scans_tsv, 'filename',
+                             _reformat_fname(self.raw_file_relative))
         # is the directory is empty remove it
         if len(list(_file_list(self.path))) == 0:
             shutil.rmtree(self.path)
 
         # remove the scan from the parent session
         self.session._scans.remove(self)
+        # Any of the inherited files may have been removed.
+        self.project._clear_caches()
+        _invalidate_queries()
         # and delete self
         del self
 
@@ -113,53 +126,83 @@ class Scan(QueryMixin):
 
     def _assign_metadata(self):
         """Associate any files that are related to this raw file."""
-        filename_data = _get_bids_params(op.basename(self._raw_file))
-        for fname in os.listdir(self.path):
-            bids_params = _get_bids_params(fname)
-            part = bids_params.pop('part', None)
-            if _bids_params_are_subsets(filename_data, bids_params):
+        associated_files = dict()
+        raw_entities = _parse_bids_name(op.basename(self._raw_file)).entities
+        for record in self._folder_records(self.path):
+            fname, bids_params, part = record.name, record.params, record.part
+            # Only files with a subset of the raw file's entities are related.
+            if record.entities <= raw_entities:
                 if (bids_params['file'] == _SIDECAR_MAP.get(self._path,
                                                             None) and
                         bids_params['ext'] == '.json'):
                     self._sidecar = fname
                 else:
                     # TODO: this will not work for .ds folders...
-                    if not op.isdir(_realize_paths(self, fname)):
+                    if not record.is_dir:
                         if part is None:
                             if fname == self._raw_file:
                                 # Don't add the raw file name to the list.
                                 continue
-                            if bids_params['file'] in self.associated_files:
+                            if bids_params['file'] in associated_files:
                                 new_key = bids_params['file'] + \
                                     bids_params['ext']
-                                self.associated_files[new_key] = fname
+                                associated_files[new_key] = fname
                             else:
-                                self.associated_files[bids_params['file']] = \
-                                    fname
+                                associated_files[bids_params['file']] = fname
                         else:
                             if part == '01':
                                 # Assign the correct raw file name.
                                 self._raw_file = fname
+                                self._raw_file_path = None
                             else:
                                 # Give a unique key to avoid conflict if there
                                 # are lots of parts for some reason...
                                 key = str(bids_params['file']) + '_' + part
-                                self.associated_files[key] = fname
+                                associated_files[key] = fname
         # If we have no sidecar file associated from the local folder, go over
         # the files that this folder inherit
         if self._sidecar is None:
-            filename_data = _get_bids_params(op.basename(self._raw_file))
-            for fname in self.session.inheritable_files:
-                bids_params = _get_bids_params(op.basename(fname))
-                if _bids_params_are_subsets(filename_data, bids_params):
+            raw_entities = _parse_bids_name(
+                op.basename(self._raw_file)).entities
+            for fname in self.session._inherited_files():
+                bids_name = _parse_bids_name(op.basename(fname))
+                bids_params = bids_name.params
+                if bids_name.entities <= raw_entities:
                     if bids_params['ext'] == '.json':
                         if bids_params['file'] == _SIDECAR_MAP.get(self._path,
                                                                    None):
                             self._sidecar = op.relpath(fname, self.path)
                         else:
-                            self.associated_files[bids_params['file']] = \
-                                op.relpath(fname, self.path)
+                            # The inherited files are shared by many scans.
+                            associated_files[bids_params['file']] = _intern(
+                                op.relpath(fname, self.path))
         # If there is still no sidecar file then it probably doesn't have one.
+        self._set_associated_files(associated_files)
+
+    def _associated_file(self, key):
+        """Path of an associated file relative to the Scan's folder.
+
+        Returns None if there is no associated file of the type `key`.
+        """
+        try:
+            return self._file_names[self._file_keys.index(key)]
+        except ValueError:
+            return None
+
+    def _associated_files(self):
+        """Dictionary of the currently associated files."""
+        return dict(zip(self._file_keys, self._file_names))
+
+    def _folder_records(self, folder):
+        """Parsed records of the contents of a folder.
+
+        If the parent Session is currently loading its scans the records are
+        shared with all the other Scans being loaded.
+        """
+        dircache = self.session._dircache
+        if dircache is None:
+            dircache = DirCache()
+        return dircache.records(folder)
 
     def _generate_map(self):
         """Generate a map of the Subject.
@@ -173,34 +216,62 @@ class Scan(QueryMixin):
 
     def _get_params(self):
         """Find the scan parameters from the file name."""
-        filename_data = _get_bids_params(op.basename(self._raw_file))
-        self.task = filename_data.get('task', None)
-        self.run = filename_data.get('run', None)
-        self.acquisition = self.acq = filename_data.get('acq', None)
-        self.proc = filename_data.get('proc', None)
+        filename_data = _parse_bids_name(op.basename(self._raw_file)).params
+        self.task = _intern(filename_data.get('task', None))
+        self.run = _intern(filename_data.get('run', None))
+        self.acq = _intern(filename_data.get('acq', None))
+        self.proc = _intern(filename_data.get('proc', None))
 
     def _load_extras(self):
         """Load any extra files on a manufacturer-by-manufacturer basis."""
-        if self.info.get('Manufacturer', None) == 'KIT/Yokogawa':
-            # Need to load the marker files.
-            # These will be in the same folder as the raw data.
-            filename_data = _get_bids_params(op.basename(self._raw_file))
-            raw_folder = op.dirname(self._raw_file)
-            for fname in os.listdir(op.join(self.path, raw_folder)):
-                bids_params = _get_bids_params(fname)
-                if _bids_params_are_subsets(filename_data, bids_params):
-                    if bids_params['file'] == 'markers':
-                        if bids_params.get('acq', None) is not None:
-                            acq = '-' + bids_params['acq']
-                        else:
-                            acq = ''
-                        self.associated_files['markers{0}'.format(acq)] = op.join(raw_folder, fname)  # noqa
+        # KIT/Yokogawa data has marker files in the same folder as the raw
+        # data. Marker files are only defined by BIDS for this manufacturer so
+        # the sidecar doesn't need to be read to check the manufacturer.
+        associated_files = self._associated_files()
+        raw_entities = _parse_bids_name(op.basename(self._raw_file)).entities
+        raw_folder = op.dirname(self._raw_file)
+        self._extras_mtime = _mtime(op.join(self.path, raw_folder))
+        for record in self.session._marker_records(
+                op.join(self.path, raw_folder)):
+            fname, bids_params = record.name, record.params
+            if record.entities <= raw_entities:
+                if bids_params.get('acq', None) is not None:
+                    acq = '-' + bids_params['acq']
+                else:
+                    acq = ''
+                associated_files['markers{0}'.format(acq)] = op.join(
+                    raw_folder, fname)
+        self._set_associated_files(associated_files)
 
     def _load_info(self):
         """Read the sidecar.json and load the information into self.info"""
-        if self._sidecar is not None:
-            with open(self.sidecar, 'r') as sidecar:
-                self.info = json.load(sidecar)
+        if self._sidecar is None:
+            self._info = _NO_INFO
+        else:
+            # Inherited sidecars are only parsed once for all the Scans.
+            self._info, self._info_mtime = _load_json(self.sidecar)
+
+    def _to_index(self):
+        """Generate the entry for the Scan in a saved index.
+
+        Returns
+        -------
+        dict
+            Information required to recreate the Scan without reading any
+            files.
+        """
+        # Make sure everything has been loaded.
+        associated_files = self.associated_files
+        info = dict(self.info)
+        return {'path': self._path,
+                'raw_file': self._raw_file,
+                'acq_time': self.acq_time,
+                'scan_params': self.scan_params,
+                'sidecar': self._sidecar,
+                'associated_files': associated_files,
+                'extras_mtime': self._extras_mtime,
+                'info': info,
+                'info_mtime': self._info_mtime}
 
     def _rename(self, subj_id, sess_id):
         """Rename all the files contained by the scan.
@@ -244,6 +315,7 @@ class Scan(QueryMixin):
         self._raw_file = _multi_replace(self._raw_file,
                                         [old_subj_id, old_sess_id],
                                         [new_subj_id, new_sess_id])
+        self._raw_file_path = None
 
         # rename all the internal file names
         if self._sidecar is not None:
@@ -252,14 +324,93 @@ class Scan(QueryMixin):
             self._sidecar = _multi_replace(self._sidecar,
                                            [old_subj_id, old_sess_id],
                                            [new_subj_id, new_sess_id])
-        for key, value in self.associated_files.items():
+        associated_files = self.associated_files
+        for key, value in associated_files.items():
             value = _fix_folderless(self.session, value, old_sess_id,
                                     old_subj_id)
-            self.associated_files[key] = _multi_replace(
+            associated_files[key] = _multi_replace(
                 value, [old_subj_id, old_sess_id], [new_subj_id, new_sess_id])
+        self._set_associated_files(associated_files)
+
+    def _set_associated_files(self, associated_files):
+        """Store the associated files.
+
+        The types of the files and their paths are stored as a pair of tuples
+        rather than a dictionary. The tuple of types is shared with every
+        other Scan with the same types of associated files.
+
+        Parameters
+        ----------
+        associated_files : dict
+            Paths to the associated files keyed by file type.
+        """
+        self._file_keys = _intern(tuple(associated_files.keys()))
+        self._file_names = tuple(associated_files.values())
+
+    @staticmethod
+    def _from_index(session, entry):
+        """Create a Scan from its entry in a saved index.
+
+        Parameters
+        ----------
+        session : :class:`bidshandler.Session`
+            Parent Session.
+        entry : dict
+            Entry for the scan generated by :meth:`_to_index`.
+
+        Returns
+        -------
+        scan : :class:`bidshandler.Scan`
+            New Scan. The folder containing the scan isn't read.
+        """
+        # Avoid __init__ as it finds the associated files from the folder.
+        scan = Scan.__new__(Scan)
+        super(Scan, scan).__init__()
+        scan._path = _intern(entry['path'])
+        scan._raw_file = entry['raw_file']
+        scan._raw_file_path = None
+        scan.acq_time = entry['acq_time']
+        scan.scan_params = entry['scan_params']
+        scan.session = session
+        scan._get_params()
+        scan._sidecar = entry['sidecar']
+
+        scan._set_associated_files(entry['associated_files'])
+        scan._extras_loaded = True
+        scan._extras_mtime = entry['extras_mtime']
+        # Only use the sidecar information if the sidecar hasn't changed.
+        scan._info = None
+        scan._info_mtime = None
+        if scan._sidecar is None:
+            scan._info = _NO_INFO
+        elif _mtime(scan.sidecar) == entry['info_mtime']:
+            scan._info = MappingProxyType(entry['info'])
+            scan._info_mtime = entry['info_mtime']
+        return scan
 
 #region properties
 
+    @property
+    def acquisition(self):
+        """Value of the `acq` key in the BIDS filename."""
+        return self.acq
+
+    @property
+    def associated_files(self):
+        """Dictionary of files associated with the raw file.
+
+        The keys are the BIDS file type (eg. `'channels'`) and the values are
+        the paths to the files relative to the Scan's folder.
+        A new dictionary is created each time this is accessed so any changes
+        made to it won't affect the Scan.
+        """
+        if not self._extras_loaded:
+            # Any manufacturer specific files are found the first time the
+            # associated files are requested.
+            self._extras_loaded = True
+            self._load_extras()
+        return self._associated_files()
+
     @property
     def bids_tree(self):
         """Parent :class:`bidshandler.BIDSTree` object."""
@@ -269,7 +420,7 @@ class Scan(QueryMixin):
     def channels_tsv(self):
         """Path to the associated channels.tsv file if there is one."""
         _path = None
-        channels_path = self.associated_files.get('channels')
+        channels_path = self._associated_file('channels')
         if channels_path is not None:
             _path = _realize_paths(self, channels_path)
         return _path
@@ -278,7 +429,7 @@ class Scan(QueryMixin):
     def coordsystem_json(self):
         """Path to the associated coordsystem.json file if there is one."""
         _path = None
-        coordsystem_path = self.associated_files.get('coordsystem')
+        coordsystem_path = self._associated_file('coordsystem')
         if coordsystem_path is not None:
             _path = _realize_paths(self, coordsystem_path)
         return _path
@@ -301,7 +452,7 @@ class Scan(QueryMixin):
             emptyroom = self.info.get('AssociatedEmptyRoom')
             if emptyroom is not None:
                 fname = op.basename(emptyroom)
-                bids_params = _get_bids_params(fname)
+                bids_params = _parse_bids_name(fname).params
                 try:
                     _path = self.project.subject(
                         bids_params['sub']).session(
@@ -319,15 +470,27 @@ class Scan(QueryMixin):
     def events_tsv(self):
         """Absolute path to the associated events.tsv file."""
         _path = None
-        events_path = self.associated_files.get('events')
+        events_path = self._associated_file('events')
         if events_path is not None:
             _path = _realize_paths(self, events_path)
         return _path
 
+    @property
+    def info(self):
+        """Contents of the sidecar file.
+
+        The sidecar is only read the first time this is accessed. The
+        contents are read-only as they are shared between all the Scans
+        using the same sidecar.
+        """
+        if self._info is None:
+            self._load_info()
+        return self._info
+
     @property
     def path(self):
         """Path of folder containing Scan."""
-        return op.join(self.session.path, self._path)
+        return self.session._scan_folder(self._path)
 
     @property
     def project(self):
@@ -337,13 +500,34 @@ class Scan(QueryMixin):
     @property
     def raw_file(self):
         """Path of associated raw file."""
-        return _realize_paths(self, self._raw_file)
+        cached = self._raw_file_path
+        if cached is None or cached[0] != _PATH_GENERATION[0]:
+            cached = self._raw_file_path = (
+                _PATH_GENERATION[0], _realize_paths(self, self._raw_file))
+        return cached[1]
 
     @property
     def raw_file_relative(self):
         """Path of associated raw file relative to parent Session."""
         return op.join(self._path, self._raw_file)
 
+    @property
+    def scan_params(self):
+        """Dictionary of any other scan parameters specified by scans.tsv.
+
+        A new dictionary is created each time this is accessed so any changes
+        made to it won't affect the Scan. Assign a new dictionary to change
+        the parameters.
+        """
+        return dict(zip(self._param_keys, self._param_values))
+
+    @scan_params.setter
+    def scan_params(self, scan_params):
+        # Stored in the same way as the associated files. The names of the
+        # parameters are the same for every Scan in a scans.tsv.
+        self._param_keys = _intern(tuple(scan_params.keys()))
+        self._param_values = tuple(scan_params.values())
+
     @property
     def scan_type(self):
         """Type of Scan.
@@ -3,17 +3,20 @@ import os.path as op
 from collections import OrderedDict
 import re
 import shutil
+from threading import RLock
 
 import xml.etree.ElementTree as ET
 
-import pandas as pd
 from datetime import datetime
 
-from .utils import (_get_bids_params, _copyfiles, _realize_paths, _combine_tsv,
+from .utils import (_parse_bids_name, _copyfiles, _realize_paths, _combine_tsv,
                     _multi_replace, _fix_folderless, _file_list,
-                    _reformat_fname)
+                    _read_tsv, _reformat_fname, _scandir, _mtime,
+                    _write_tsv, _invalidate_paths, _invalidate_queries,
+                    _PATH_GENERATION)
 from .bidserrors import MappingError, AssociationError, NoScanError
 from .scan import Scan
+from .dircache import DirCache
 from .querymixin import QueryMixin
 from .constants import _RAW_FILETYPES, _SIDECAR_MAP
 
@@ -27,14 +30,22 @@ class Session(QueryMixin):
         Id of the session. This is the sequence of characters after `'ses-'`.
     subject : :class:`bidshandler.Subject`
         Parent Subject object containing this Session.
-    initialize : bool, optional
+    initialize : bool | 'lazy', optional
         Whether to parse the folder and load any child structures.
+        If `'lazy'` the folder is parsed but the Scans are only loaded the
+        first time they are accessed.
     no_folder : bool, optional
         Whether or not the session is contained within a `ses-XX` folder.
         For experiments with multiple sessions each folder will correspond to
         a Session object, however if there is only a single session this can
         be omitted and the Subject folder is in fact the Session folder.
     """
+    __slots__ = ('_id', 'subject', '_scans_tsv', '_scans', 'recording_types',
+                 '_has_no_folder', 'extra_data', '_folder_files', '_mtimes',
+                 '_dircache', '_markers', '_lazy', '_lock', '_paths')
+
+    _queryable_types = ('session', 'scan')
+
     def __init__(self, id_, subject, initialize=True, no_folder=False):
         super(Session, self).__init__()
         self._id = id_
@@ -43,16 +54,37 @@ class Session(QueryMixin):
         self._scans = []
         self.recording_types = []
 
-        self._queryable_types = ('session', 'scan')
-
-        self.has_no_folder = no_folder
+        # Generation the paths were found in, the path of the session and
+        # the paths of the folders containing scans.
+        self._paths = None
+        self._has_no_folder = no_folder
 
         # list of folder that contain extra associated data for the session
         self.extra_data = []
 
+        # Paths of the files in the session folder. Only read when needed.
+        self._folder_files = None
+        # Modification times of the files and folders (relative to the
+        # session folder) when they were read to load the session.
+        self._mtimes = dict()
+
+        # Cache of folder contents shared by the Scans while they are loaded.
+        self._dircache = None
+        # Modification time and records of the marker files of each folder
+        # containing raw files.
+        self._markers = dict()
+
+        # Whether the scans still need to be loaded.
+        self._lazy = False
+        self._lock = RLock()
+
         if initialize:
-            self._add_scans()
-            self._check()
+            self._parse_folder()
+            if initialize == 'lazy':
+                self._lazy = True
+            else:
+                self._add_scans()
+                self._check()
 
 #region public methods
 
@@ -109,13 +141,11 @@ class Session(QueryMixin):
                 # TODO: add overwrite argument to allow it to still be
                 # added.
                 return
-            other_scan_df = pd.DataFrame(
-                OrderedDict([
-                    ('filename', [_reformat_fname(other.raw_file_relative)]),
-                    ('acq_time', [other.acq_time])]),
-                columns=['filename', 'acq_time'])
+            other_scan_data = OrderedDict([
+                ('filename', [_reformat_fname(other.raw_file_relative)]),
+                ('acq_time', [other.acq_time])])
             # Combine the new data into the original tsv.
-            _combine_tsv(self.scans_tsv, other_scan_df, 'filename')
+            _combine_tsv(self.scans_tsv, other_scan_data, 'filename')
 
             # Assign as a set to avoid any potential doubling of the raw
             # file path.
@@ -140,6 +170,9 @@ class Session(QueryMixin):
         else:
             raise TypeError("Cannot add a {0} object to a Subject".format(
                 type(other).__name__))
+        # Files may have been added to the session folder.
+        self._folder_files = None
+        _invalidate_queries()
 
     def contained_files(self):
         """Get the list of contained files.
@@ -169,6 +202,47 @@ class Session(QueryMixin):
 
         # Remove this session from the session list in the subject and delete.
         del self.subject._sessions[self._id]
+        self.subject._clear_caches()
+        _invalidate_queries()
+
+    def refresh(self):
+        """Reload the Scans if any of the session's files have changed.
+
+        Only the modification times of the files and folders which were read
+        to load the Scans are checked. If only a sidecar has changed its
+        contents will be read again the next time they are needed.
+
+        Returns
+        -------
+        bool
+            Whether anything in the session has changed since it was loaded.
+        """
+        if self._lazy:
+            # Nothing has been loaded yet.
+            return False
+        changed = False
+        for fpath, mtime in self._mtimes.items():
+            if _mtime(op.join(self.path, fpath)) != mtime:
+                changed = True
+                break
+        for scan in self._scans:
+            if changed:
+                break
+            if scan._extras_loaded and scan._extras_mtime != _mtime(
+                    op.join(scan.path, op.dirname(scan._raw_file))):
+                changed = True
+        if changed:
+            self._reload()
+            return True
+        for scan in self._scans:
+            if scan._info is not None and scan._sidecar is not None:
+                if _mtime(scan.sidecar) != scan._info_mtime:
+                    scan._info = None
+                    changed = True
+        if changed:
+            # Any indexed sidecar values may have changed.
+            _invalidate_queries()
+        return changed
 
     def rename(self, id_):
         """Change the sessions' id.
@@ -232,54 +306,46 @@ class Session(QueryMixin):
 #region private methods
 
     def _add_scans(self):
-        """Parse the session folder to find what recordings are included."""
-        for fname in os.listdir(self.path):
-            full_path = op.join(self.path, fname)
-            # Each sub-directory is considered a separate type of recording.
-            if op.isdir(full_path):
-                if fname in _SIDECAR_MAP.keys():
-                    self.recording_types.append(fname)
-                else:
-                    self.extra_data.append(fname)
-            # The only other non-folder should be the scans tsv.
-            else:
-                filename_data = _get_bids_params(fname)
-                if filename_data.get('file', None) == 'scans':
-                    # Store the path and extract the paths of the scans.
-                    self._scans_tsv = fname
-                    scans = pd.read_csv(_realize_paths(self, self._scans_tsv),
-                                        sep='\t')
-                    column_names = set(scans.columns.values)
-                    if 'filename' not in column_names:
-                        raise MappingError(
-                            "{0} contains no 'filename' column".format(
-                                self.scans_tsv))
-                    column_names.remove('filename')
-                    for i in range(len(scans)):
-                        row = scans.iloc[i]
-                        fname = row.pop('filename')
-                        self._scans.append(
-                            Scan(fname, self, **dict(row)))
+        """Create the Scan objects for all the recordings in the session."""
+        # Each folder only needs to be read once for all the scans.
+        self._dircache = DirCache()
+        try:
+            self._add_scans_from_folder()
+            # Find the marker files now so that the folders don't need to be
+            # read again when the associated files are first requested.
+            for folder in set(op.join(scan.path, op.dirname(scan._raw_file))
+                              for scan in self._scans):
+                self._marker_records(folder)
+            for folder, mtime in self._dircache.mtimes.items():
+                self._mtimes[op.relpath(folder, self.path)] = mtime
+        finally:
+            self._dircache = None
+
+    def _add_scans_from_folder(self):
+        """Find and create the Scan objects within the session folder."""
+        if self._scans_tsv is not None:
+            # Extract the paths of the scans from the scans.tsv.
+            self._mtimes[self._scans_tsv] = _mtime(self.scans_tsv)
+            scans = _read_tsv(self.scans_tsv)
+            if 'filename' not in scans:
+                raise MappingError(
+                    "{0} contains no 'filename' column".format(
+                        self.scans_tsv))
+            filenames = scans.pop('filename')
+            for i, fname in enumerate(filenames):
+                row = dict((col_name, values[i]) for col_name, values in
+                           scans.items())
+                self._scans.append(Scan(fname, self, **row))
         # if we haven't found a scans.tsv file then we need to add all the
         # scans in a different way.
-        if self._scans_tsv is None:
+        else:
             # for now do just MRI stuff which is any .nii.gz file I think?
             #TODO: have a switch for each folder name?
             for rec_type in self.recording_types:
                 if rec_type not in ('anat', 'dwi'):
                     rec_path = _realize_paths(self, rec_type)
-                    if rec_type == 'fmap':
-                        # fieldmap sequence
-                        # The files with `file` = `magnitude1` are not raw
-                        # scans.
-                        filename_data = _get_bids_params(fname)
-                        if ((filename_data['file'] not in ('magnitude1',
-                                                           'magnitude2')) and
-                                'nii' in fname):
-                            self._scans.append(
-                                Scan(op.join(rec_type, fname), self))
-
-                    for fname in os.listdir(rec_path):
+                    rec_listing = self._dircache.listdir(rec_path)
+                    for fname in rec_listing.dirs + rec_listing.files:
                         for ext in _RAW_FILETYPES:
                             if ext in fname:
                                 self._scans.append(
@@ -291,6 +357,106 @@ class Session(QueryMixin):
             raise MappingError("No scans found in {0}/{1}/{2}.".format(
                 self.project.ID, self.subject.ID, self.ID))
 
+    def _clear_caches(self):
+        """Clear any cached folder contents."""
+        self._folder_files = None
+
+    def _inherited_files(self):
+        """Paths of the files that can be inherited by child objects.
+
+        The session folder is only read the first time this is called.
+        """
+        if self._folder_files is None:
+            self._folder_files = tuple(
+                _realize_paths(self, _scandir(self.path).files))
+        return self.subject._inherited_files() + self._folder_files
+
+    def _load_scans(self):
+        """Create the Scan objects if the Session was lazily initialized."""
+        if self._lazy:
+            with self._lock:
+                if self._lazy:
+                    self._add_scans()
+                    self._check()
+                    self._lazy = False
+
+    def _marker_records(self, folder):
+        """Parsed records of the marker files within a folder.
+
+        The records found when the Scans were loaded are reused unless the
+        folder has been modified since.
+        """
+        if self._dircache is None:
+            cached = self._markers.get(folder)
+            if cached is not None and cached[0] == _mtime(folder):
+                return cached[1]
+            dircache = DirCache()
+        else:
+            dircache = self._dircache
+        records = tuple(record for record in dircache.records(folder) if
+                        not record.is_dir and
+                        record.params['file'] == 'markers')
+        self._markers[folder] = (dircache.mtimes[folder], records)
+        return records
+
+    def _parse_folder(self):
+        """Parse the session folder to find what recordings are included."""
+        self._mtimes['.'] = _mtime(self.path)
+        listing = _scandir(self.path)
+        # Each sub-directory is considered a separate type of recording.
+        for fname in listing.dirs:
+            if fname in _SIDECAR_MAP.keys():
+                self.recording_types.append(fname)
+            else:
+                self.extra_data.append(fname)
+        # The only other non-folder should be the scans tsv.
+        for fname in listing.files:
+            filename_data = _parse_bids_name(fname).params
+            if filename_data.get('file', None) == 'scans':
+                self._scans_tsv = fname
+
+    @staticmethod
+    def _from_index(id_, subject, entry):
+        """Create a Session from its entry in a saved index.
+
+        Parameters
+        ----------
+        id_ : str
+            Id of the session.
+        subject : :class:`bidshandler.Subject`
+            Parent Subject.
+        entry : dict
+            Entry for the session generated by :meth:`_to_index`.
+
+        Returns
+        -------
+        new_session : :class:`bidshandler.Session` | None
+            New Session with all its Scans. If any of the files or folders
+            the session was loaded from have been modified since the entry
+            was generated this is None.
+        """
+        new_session = Session(id_, subject, initialize=False,
+                              no_folder=entry['no_folder'])
+        mtimes = dict(entry['mtimes'])
+        # The marker files of a scan may be in a sub-folder.
+        for scan_entry in entry['scans']:
+            raw_folder = op.normpath(op.join(
+                scan_entry['path'], op.dirname(scan_entry['raw_file'])))
+            extras_mtime = scan_entry['extras_mtime']
+            if mtimes.setdefault(raw_folder, extras_mtime) != extras_mtime:
+                return None
+        for fpath, mtime in mtimes.items():
+            if mtime is None or _mtime(op.join(new_session.path,
+                                               fpath)) != mtime:
+                return None
+        new_session._scans_tsv = entry['scans_tsv']
+        new_session.recording_types = entry['recording_types']
+        new_session.extra_data = entry['extra_data']
+        new_session._mtimes = entry['mtimes']
+        new_session._scans = [Scan._from_index(new_session, scan_entry) for
+                              scan_entry in entry['scans']]
+        return new_session
+
     @staticmethod
     def _clone_into_subject(subject, other):
         """Create a copy of the Session with a new parent Subject.
@@ -320,10 +486,7 @@ class Session(QueryMixin):
         self._scans_tsv = '{0}_{1}_scans.tsv'.format(self.subject.ID, self.ID)
         full_path = _realize_paths(self, self._scans_tsv)
         if not op.exists(full_path):
-            df = pd.DataFrame(OrderedDict([('filename', [])]),
-                              columns=['filename'])
-            df.to_csv(full_path, sep='\t', index=False, na_rep='n/a',
-                      encoding='utf-8')
+            _write_tsv(full_path, OrderedDict([('filename', [])]))
 
     def _generate_map(self):
         """Generate a map of the Session.
@@ -338,6 +501,48 @@ class Session(QueryMixin):
             root.append(scan._generate_map())
         return root
 
+    def _reload(self):
+        """Load the Session and all its Scans from the folder again.
+
+        If no scans can be found (eg. because the folder is part way through
+        being written) the Session is removed from its Subject, and the
+        Subject folder is checked again the next time it is refreshed.
+        """
+        self._scans_tsv = None
+        self._scans = []
+        self.recording_types = []
+        self.extra_data = []
+        self._mtimes = dict()
+        self._markers = dict()
+        self._clear_caches()
+        self._parse_folder()
+        try:
+            self._add_scans()
+            self._check()
+        except MappingError:
+            self.subject._sessions.pop(self._id, None)
+            self.subject._mtime = None
+        _invalidate_queries()
+
+    def _to_index(self):
+        """Generate the entry for the Session in a saved index.
+
+        Returns
+        -------
+        dict | None
+            Information required to recreate the Session and its Scans
+            without reading any files. If the Scans haven't been loaded yet
+            this is None.
+        """
+        if self._lazy:
+            return None
+        return {'no_folder': self.has_no_folder,
+                'scans_tsv': self._scans_tsv,
+                'recording_types': self.recording_types,
+                'extra_data': self.extra_data,
+                'mtimes': self._mtimes,
+                'scans': [scan._to_index() for scan in self._scans]}
+
     def _rename(self, subj_id, sess_id):
         """Change the session id for all contained files.
 
@@ -372,15 +577,15 @@ class Session(QueryMixin):
         # update the row data to point to the new scan locations
         if old_scans_tsv is not None:
             if op.exists(old_scans_tsv):
-                df = pd.read_csv(old_scans_tsv, sep='\t')
-                for idx, row in enumerate(df['filename']):
+                columns = _read_tsv(old_scans_tsv, convert=False)
+                filenames = columns['filename']
+                for idx, row in enumerate(filenames):
                     row = _fix_folderless(self, row, old_sess_id, old_subj_id)
                     row = _reformat_fname(row)
-                    df.at[idx, 'filename'] = _multi_replace(
+                    filenames[idx] = _multi_replace(
                         row, [old_subj_id, old_sess_id],
                         [new_subj_id, new_sess_id])
-                df.to_csv(old_scans_tsv, sep='\t', index=False, na_rep='n/a',
-                          encoding='utf-8')
+                _write_tsv(old_scans_tsv, columns)
 
             self._scans_tsv = _fix_folderless(self, self._scans_tsv,
                                               old_sess_id, old_subj_id)
@@ -400,12 +605,33 @@ class Session(QueryMixin):
         # change the internal id. self.ID -> new_sess_id
         old_id = self._id
         self._id = sess_id
+        _invalidate_paths()
         # update the parent subject dictionary
         if old_id != self._id:
             self.subject._sessions[self._id] = self
             del self.subject._sessions[old_id]
         if self._id != 'none':
             self.has_no_folder = False
+        self._clear_caches()
+        _invalidate_queries()
+
+    def _scan_folder(self, folder):
+        """Path of a folder within the session containing scans.
+
+        The paths are cached so that they aren't found again for every Scan.
+
+        Parameters
+        ----------
+        folder : str
+            Path of the folder relative to the session folder.
+        """
+        path = self.path
+        folders = self._paths[2]
+        try:
+            return folders[folder]
+        except KeyError:
+            fpath = folders[folder] = op.join(path, folder)
+            return fpath
 
 #region properties
 
@@ -442,6 +668,16 @@ class Session(QueryMixin):
                         break
         return known_date
 
+    @property
+    def has_no_folder(self):
+        """Whether the session is stored directly in the Subject folder."""
+        return self._has_no_folder
+
+    @has_no_folder.setter
+    def has_no_folder(self, value):
+        self._has_no_folder = value
+        _invalidate_paths()
+
     @property
     def ID(self):
         """ID with 'ses' prefix."""
@@ -451,19 +687,19 @@ class Session(QueryMixin):
     def inheritable_files(self):
         """List of files that are able to be inherited by child objects."""
         # TODO: make private?
-        files = self.subject.inheritable_files
-        for fname in os.listdir(self.path):
-            abs_path = _realize_paths(self, fname)
-            if op.isfile(abs_path):
-                files.append(abs_path)
-        return files
+        return list(self._inherited_files())
 
     @property
     def path(self):
         """Path to Session folder."""
-        if self.has_no_folder:
-            return self.subject.path
-        return _realize_paths(self.subject, self.ID)
+        paths = self._paths
+        if paths is None or paths[0] != _PATH_GENERATION[0]:
+            if self.has_no_folder:
+                path = self.subject.path
+            else:
+                path = _realize_paths(self.subject, self.ID)
+            paths = self._paths = (_PATH_GENERATION[0], path, dict())
+        return paths[1]
 
     @property
     def project(self):
@@ -479,6 +715,7 @@ class Session(QueryMixin):
         list of :class:`bidshandler.Scan`
             All Scans within this Session.
         """
+        self._load_scans()
         return self._scans
 
     @property
@@ -505,7 +742,7 @@ class Session(QueryMixin):
             Returns True if the object is contained within this Session.
         """
         if isinstance(other, Scan):
-            for scan in self._scans:
+            for scan in self.scans:
                 if scan == other:
                     return True
             return False
@@ -513,7 +750,7 @@ class Session(QueryMixin):
 
     def __iter__(self):
         """Iterable of the contained Scan objects."""
-        return iter(self._scans)
+        return iter(self.scans)
 
     def __repr__(self):
         return '<Session, ID: {0}, {1} scan{2}, @ {3}>'.format(
@@ -5,13 +5,15 @@ import xml.etree.ElementTree as ET
 import shutil
 from warnings import warn
 
-import pandas as pd
-
 from .bidserrors import MappingError, NoSessionError, AssociationError
 from .session import Session
 from .scan import Scan
 from .querymixin import QueryMixin
-from .utils import _copyfiles, _realize_paths, _file_list
+from .lazydict import LazyDict
+from .utils import (_copyfiles, _realize_paths, _file_list, _scandir,
+                    _map_threaded, _mtime, _combine_tsv, _read_tsv,
+                    _remove_tsv_rows, _write_tsv, _invalidate_paths,
+                    _invalidate_queries, _PATH_GENERATION)
 
 
 class Subject(QueryMixin):
@@ -23,15 +25,31 @@ class Subject(QueryMixin):
         Id of the subject. This is the sequence of characters after `'sub-'`.
     project : :class:`bidshandler.Project`
         Parent Project object containing this Subject.
-    initialize : bool, optional
+    initialize : bool | 'lazy', optional
         Whether to parse the folder and load any child structures.
+        If `'lazy'` the folder is parsed but each Session is only loaded the
+        first time it is accessed.
+    workers : int, optional
+        Number of threads used to load the contained sessions.
+        By default the sessions are loaded one after the other.
     """
-    def __init__(self, id_, project, initialize=True):
+    def __init__(self, id_, project, initialize=True, workers=None):
         super(Subject, self).__init__()
         self._id = id_
         self.project = project
         # Contained sessions
-        self._sessions = dict()
+        self._sessions = LazyDict(self._load_session)
+        # Paths of the files in the subject folder. Only read when needed.
+        self._folder_files = None
+        # Names of the files in the subject folder when it was last read to
+        # load or refresh the sessions.
+        self._listed_files = None
+        # Modification time of the subject folder when it was read.
+        self._mtime = None
+        # Whether sessions are only loaded the first time they are accessed.
+        self._load_lazily = False
+        # Generation the path was found in and the path.
+        self._path_cache = None
 
         # All the various information about the subject from the
         # participants.tsv file.
@@ -41,7 +59,7 @@ class Subject(QueryMixin):
 
         if initialize:
             self._load_subject_info()
-            self._add_sessions()
+            self._add_sessions(workers, lazy=(initialize == 'lazy'))
             self._check()
 
 #region public methods
@@ -116,6 +134,9 @@ class Subject(QueryMixin):
         else:
             raise TypeError("Cannot add a {0} object to a Subject".format(
                 type(other).__name__))
+        # Files may have been added to the subject folder.
+        self._folder_files = None
+        _invalidate_queries()
 
     def contained_files(self):
         """Get the list of contained files.
@@ -137,16 +158,30 @@ class Subject(QueryMixin):
             session.delete()
         # remove the subject information from the participants.tsv
         if self.project.participants_tsv is not None:
-            df = pd.read_csv(self.project.participants_tsv, sep='\t')
-            row_idx = df[df['participant_id'] == self.ID].index.item()
-            df = df.drop(row_idx)
-            df.to_csv(self.project.participants_tsv, sep='\t', index=False,
-                      na_rep='n/a', encoding='utf-8')
+            _remove_tsv_rows(self.project.participants_tsv,
+                             'participant_id', self.ID)
+            self.project._remove_participant(self.ID)
 
         if len(list(_file_list(self.path))) == 0:
             shutil.rmtree(self.path)
 
         del self.project._subjects[self._id]
+        self.project._clear_caches()
+        _invalidate_queries()
+
+    def refresh(self):
+        """Update the Subject with any changes made to the folder.
+
+        Any new sessions are added, any sessions whose folders have been
+        removed are removed, and any loaded sessions which have changed are
+        reloaded.
+
+        Returns
+        -------
+        bool
+            Whether anything in the subject has changed since it was loaded.
+        """
+        return self._refresh()
 
     def rename(self, id_):
         """Change the subjects' id.
@@ -181,18 +216,60 @@ class Subject(QueryMixin):
 
 #region private methods
 
-    def _add_sessions(self):
-        """Add all the sessions in the folder to the Subject."""
-        for fname in os.listdir(self.path):
-            full_path = op.join(self.path, fname)
-            if op.isdir(full_path) and 'ses' in fname:
-                ses_id = fname.split('-')[1]
-                self._sessions[ses_id] = Session(ses_id, self)
-        # If we haven't found any sub-folders with 'ses' in their name try and
-        # assume that the current folder is in fact the session folder (ie.
-        # only one session).
-        if len(self._sessions) == 0:
-            self._sessions['none'] = Session('none', self, no_folder=True)
+    def _add_sessions(self, workers=None, lazy=False, index=None):
+        """Add all the sessions in the folder to the Subject.
+
+        Parameters
+        ----------
+        workers : int, optional
+            Number of threads used to load the sessions.
+        lazy : bool, optional
+            Whether to only register the sessions so that they are loaded the
+            first time they are accessed.
+        index : dict, optional
+            Entry for the subject from a saved index. Any sessions which
+            haven't changed since the index was saved are loaded from it.
+        """
+        mtime = _mtime(self.path)
+        if index is not None and index['mtime'] == mtime:
+            ses_ids = list(index['sessions'].keys())
+            no_folder = index['no_folder']
+            self._folder_files = tuple(_realize_paths(self, index['files']))
+            self._listed_files = tuple(index['files'])
+        else:
+            listing = _scandir(self.path)
+            ses_ids, no_folder = self._session_ids(listing)
+            self._folder_files = tuple(_realize_paths(self, listing.files))
+            self._listed_files = tuple(listing.files)
+            if index is not None and set(listing.files) != set(index['files']):
+                # The files inherited by the sessions may have changed.
+                index = None
+        self._mtime = mtime
+        self._load_lazily = lazy
+        entries = index['sessions'] if index is not None else dict()
+
+        def _load(ses_id):
+            entry = entries.get(ses_id)
+            if entry is not None:
+                session = Session._from_index(ses_id, self, entry)
+                if session is not None:
+                    return session
+            return Session(ses_id, self, initialize=('lazy' if lazy else True),
+                           no_folder=no_folder)
+
+        if lazy and not no_folder:
+            for ses_id in ses_ids:
+                self._sessions.add_lazy(ses_id)
+            # Any sessions in the index can be loaded straight away.
+            for ses_id in ses_ids:
+                if entries.get(ses_id) is not None:
+                    session = Session._from_index(ses_id, self,
+                                                  entries[ses_id])
+                    if session is not None:
+                        self._sessions[ses_id] = session
+        else:
+            for session in _map_threaded(_load, ses_ids, workers):
+                self._sessions[session._id] = session
 
     def _check(self):
         """Check that there is at least one included session."""
@@ -200,6 +277,54 @@ class Subject(QueryMixin):
             raise MappingError("No sessions found in {0}/{1}.".format(
                 self.project.ID, self.ID))
 
+    def _clear_caches(self):
+        """Clear any cached folder contents of this and all child objects."""
+        self._folder_files = None
+        for session in self._sessions.loaded_values():
+            session._clear_caches()
+
+    def _inherited_files(self):
+        """Paths of the files that can be inherited by child objects.
+
+        The subject folder is only read the first time this is called.
+        """
+        if self._folder_files is None:
+            self._folder_files = tuple(
+                _realize_paths(self, _scandir(self.path).files))
+        return self.project._inherited_files() + self._folder_files
+
+    def _load_session(self, ses_id):
+        """Load a lazily registered session."""
+        return Session(ses_id, self, initialize='lazy')
+
+    @staticmethod
+    def _from_index(id_, project, entry, lazy=False):
+        """Create a Subject from its entry in a saved index.
+
+        Parameters
+        ----------
+        id_ : str
+            Id of the subject.
+        project : :class:`bidshandler.Project`
+            Parent Project.
+        entry : dict
+            Entry for the subject generated by :meth:`_to_index`.
+        lazy : bool, optional
+            Whether any sessions which have changed since the index was saved
+            are only loaded the first time they are accessed.
+
+        Returns
+        -------
+        new_subject : :class:`bidshandler.Subject`
+            New Subject. Only the sessions which have changed since the index
+            was saved are loaded from the folder.
+        """
+        new_subject = Subject(id_, project, initialize=False)
+        new_subject._load_subject_info()
+        new_subject._add_sessions(lazy=lazy, index=entry)
+        new_subject._check()
+        return new_subject
+
     @staticmethod
     def _clone_into_project(project, other):
         """Create a copy of the Subject with a new parent Project.
@@ -223,16 +348,11 @@ class Subject(QueryMixin):
         new_subject = Subject(other._id, project, initialize=False)
 
         # Merge the subject data into the participants.tsv file.
-        df = pd.read_csv(project.participants_tsv, sep='\t')
         data = [('participant_id', [other.ID])]
         for key, value in other.subject_data.items():
             data.append((key, [value]))
-        other_sub_df = pd.DataFrame(
-            OrderedDict(data),
-            columns=['participant_id', *other.subject_data.keys()])
-        df = df.append(other_sub_df, sort=False)
-        df.to_csv(project.participants_tsv, sep='\t', index=False,
-                  na_rep='n/a', encoding='utf-8')
+        _combine_tsv(project.participants_tsv, OrderedDict(data))
+        project._add_participant(other.ID, other.subject_data)
 
         # Check if the new parent has a participants.json file.
         # If not, give it the one with this subject if it has one.
@@ -246,24 +366,9 @@ class Subject(QueryMixin):
         return new_subject
 
     def _load_subject_info(self):
-        participant_path = op.join(op.dirname(self.path), 'participants.tsv')
-        if not op.exists(participant_path):
-            return
-        participants = pd.read_csv(participant_path, sep='\t')
-        column_names = set(participants.columns.values)
-        if 'participant_id' not in column_names:
-            # temporary error... This means the file is bad.
-            raise MappingError
-        column_names.remove('participant_id')
-        row = participants.loc[participants['participant_id'] == self.ID]
-        for col_name in column_names:
-            val = row.get(col_name)
-            if val is not None:
-                if not val.empty:
-                    # Ignore empty rows.
-                    self.subject_data[col_name] = val.item()
-            else:
-                self.subject_data[col_name] = "n/a"
+        """Load the subject's information from the participants.tsv."""
+        # The participants.tsv is only read once by the parent project.
+        self.subject_data.update(self.project._participant_info(self.ID))
 
     def _generate_map(self):
         """Generate a map of the Subject.
@@ -284,6 +389,110 @@ class Subject(QueryMixin):
             root.append(session._generate_map())
         return root
 
+    def _refresh(self, reload=False):
+        """Update the Subject with any changes made to the folder.
+
+        Parameters
+        ----------
+        reload : bool, optional
+            Whether to reload all the loaded sessions even if they haven't
+            changed (eg. because the files they inherit have changed).
+
+        Returns
+        -------
+        bool
+            Whether anything in the subject has changed since it was loaded.
+        """
+        mtime = _mtime(self.path)
+        if mtime == self._mtime and not reload:
+            changed = False
+            for session in self._sessions.loaded_values():
+                changed = session.refresh() or changed
+            return changed
+
+        listing = _scandir(self.path)
+        ses_ids, no_folder = self._session_ids(listing)
+        self._folder_files = tuple(_realize_paths(self, listing.files))
+        self._mtime = mtime
+        # If the files which can be inherited have changed every session
+        # needs to be reloaded.
+        files_changed = reload or self._listed_files != tuple(listing.files)
+        self._listed_files = tuple(listing.files)
+        for ses_id in list(self._sessions.keys()):
+            if ses_id not in ses_ids:
+                del self._sessions[ses_id]
+            elif self._sessions.is_loaded(ses_id):
+                session = self._sessions[ses_id]
+                if files_changed and not session._lazy:
+                    session._reload()
+                else:
+                    session.refresh()
+        for ses_id in ses_ids:
+            if ses_id in self._sessions:
+                continue
+            if self._load_lazily and not no_folder:
+                self._sessions.add_lazy(ses_id)
+                continue
+            try:
+                self._sessions[ses_id] = Session(
+                    ses_id, self,
+                    initialize=('lazy' if self._load_lazily else True),
+                    no_folder=no_folder)
+            except MappingError:
+                # The session is probably still being written. Make sure the
+                # folder is checked again next time.
+                self._mtime = None
+        _invalidate_queries()
+        return True
+
+    def _session_ids(self, listing):
+        """Find the ids of the sessions in the subject folder.
+
+        Parameters
+        ----------
+        listing : :py:class:`bidshandler.utils._DirListing`
+            Contents of the subject folder.
+
+        Returns
+        -------
+        ses_ids : list of str
+            Ids of the sessions.
+        no_folder : bool
+            Whether the subject folder is in fact the only session folder.
+        """
+        ses_ids = [fname.split('-')[1] for fname in listing.dirs
+                   if 'ses' in fname]
+        # If we haven't found any sub-folders with 'ses' in their name try and
+        # assume that the current folder is in fact the session folder (ie.
+        # only one session).
+        no_folder = len(ses_ids) == 0
+        if no_folder:
+            ses_ids = ['none']
+        return ses_ids, no_folder
+
+    def _to_index(self):
+        """Generate the entry for the Subject in a saved index.
+
+        Returns
+        -------
+        dict
+            Information required to recreate the Subject and all its loaded
+            Sessions without reading any files.
+        """
+        # Make sure the contents of the folder are known.
+        self._inherited_files()
+        sessions = OrderedDict()
+        for ses_id in self._sessions:
+            if self._sessions.is_loaded(ses_id):
+                sessions[ses_id] = self._sessions[ses_id]._to_index()
+            else:
+                sessions[ses_id] = None
+        return {'mtime': self._mtime,
+                'files': [op.basename(fname) for fname in self._folder_files],
+                'no_folder': any(session.has_no_folder for session in
+                                 self._sessions.loaded_values()),
+                'sessions': sessions}
+
     def _rename(self, subj_id):
         """Change the session id for all contained files.
 
@@ -305,13 +514,15 @@ class Subject(QueryMixin):
             session._rename(subj_id, session._id)
 
         if op.exists(self.project.participants_tsv):
-            df = pd.read_csv(self.project.participants_tsv, sep='\t')
-            for idx, row in enumerate(df['participant_id']):
+            columns = _read_tsv(self.project.participants_tsv,
+                                convert=False)
+            participant_ids = columns['participant_id']
+            for idx, row in enumerate(participant_ids):
                 if row == old_subj_id:
-                    df.at[idx, 'participant_id'] = new_subj_id
+                    participant_ids[idx] = new_subj_id
                     break
-            df.to_csv(self.project.participants_tsv, sep='\t', index=False,
-                      na_rep='n/a', encoding='utf-8')
+            _write_tsv(self.project.participants_tsv, columns)
+            self.project._rename_participant(old_subj_id, new_subj_id)
 
         # remove the old path
         if len(list(_file_list(old_path))) == 0:
@@ -323,7 +534,9 @@ class Subject(QueryMixin):
                     [_realize_paths(self, p) for p in os.listdir(old_path)])))
 
         self._id = subj_id
-
+        _invalidate_paths()
+        self._clear_caches()
+        _invalidate_queries()
 
 #region properties
 
@@ -341,17 +554,16 @@ class Subject(QueryMixin):
     def inheritable_files(self):
         """List of files that are able to be inherited by child objects."""
         # TODO: make private?
-        files = self.project.inheritable_files
-        for fname in os.listdir(self.path):
-            abs_path = _realize_paths(self, fname)
-            if op.isfile(abs_path):
-                files.append(abs_path)
-        return files
+        return list(self._inherited_files())
 
     @property
     def path(self):
         """Path of Subject folder."""
-        return op.join(self.project.path, self.ID)
+        cached = self._path_cache
+        if cached is None or cached[0] != _PATH_GENERATION[0]:
+            cached = self._path_cache = (
+                _PATH_GENERATION[0], op.join(self.project.path, self.ID))
+        return cached[1]
 
     @property
     def scans(self):
@@ -418,8 +630,8 @@ class Subject(QueryMixin):
     def __repr__(self):
         return '<Subject, ID: {0}, {1} session{2}, @ {3}>'.format(
             self.ID,
-            len(self.sessions),
-            ('s' if len(self.sessions) != 1 else ''),
+            len(self._sessions),
+            ('s' if len(self._sessions) != 1 else ''),
             self.path)
 
     def __str__(self):
@@ -427,5 +639,5 @@ class Subject(QueryMixin):
         output.append('ID: {0}'.format(self.ID))
         for key, value in self.subject_data.items():
             output.append('{0}: {1}'.format(key.title(), value))
-        output.append('Number of Sessions: {0}'.format(len(self.sessions)))
+        output.append('Number of Sessions: {0}'.format(len(self._sessions)))
         return '\n'.join(output)
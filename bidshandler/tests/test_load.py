@@ -1,16 +1,20 @@
 # Test various aspects of loading BIDS folders
 
 import tempfile
+import os
 import os.path as op
 import shutil
+import time
+from queue import Queue
 import pytest
 from datetime import date
 
 import pandas as pd
 
-from bidshandler import (BIDSTree, NoSessionError, NoSubjectError,
-                         NoProjectError, NoScanError)
+from bidshandler import (BIDSTree, Session, Subject, NoSessionError,
+                         NoSubjectError, NoProjectError, NoScanError)
 from bidshandler.constants import test_path
+from bidshandler.watcher import _Inotify
 
 testpath = test_path()
 TESTPATH1 = op.join(testpath, 'BIDSTEST1')
@@ -130,6 +134,274 @@ def test_deleting():
         assert 'sub-1' not in df['participant_id']
 
 
+def test_inheritable_files():
+    # The inheritable files are cached until the tree is modified.
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copytree(TESTPATH1, op.join(tmp, 'BIDSTEST1'))
+        bt = BIDSTree(op.join(tmp, 'BIDSTEST1'))
+        proj = bt.project('test1')
+        sess = proj.subject(2).session(2)
+        files = sess.inheritable_files
+        new_file = op.join(proj.path, 'task-test_meg.json')
+        with open(new_file, 'w') as f:
+            f.write('{}')
+        assert sess.inheritable_files == files
+        proj.subject(1).delete()
+        assert new_file in sess.inheritable_files
+
+
+def test_participants():
+    # The participants.tsv is read once by the project and kept up to date.
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copytree(TESTPATH1, op.join(tmp, 'BIDSTEST1'))
+        bt = BIDSTree(op.join(tmp, 'BIDSTEST1'))
+        proj = bt.project('test1')
+        assert list(proj._participants.keys()) == ['sub-1', 'sub-2']
+        assert proj.subject(2).subject_data == proj._participant_info('sub-2')
+        data = proj.subject(2).subject_data
+        proj.subject(2).rename(5)
+        assert list(proj._participants.keys()) == ['sub-1', 'sub-5']
+        assert proj._participant_info('sub-5') == data
+        proj.subject(1).delete()
+        assert list(proj._participants.keys()) == ['sub-5']
+
+
+def test_threaded_loading():
+    # Loading using a pool of threads should produce the same tree.
+    tree = BIDSTree(TESTPATH1)
+    threaded_tree = BIDSTree(TESTPATH1, workers=4)
+    assert tree.generate_map() == threaded_tree.generate_map()
+    subj = threaded_tree.project('test1').subject(1)
+    threaded_subj = Subject(subj._id, subj.project, workers=2)
+    assert len(threaded_subj.sessions) == len(subj.sessions)
+
+
+def test_lazy_loading():
+    # Lazily loaded trees should only load objects as they are accessed.
+    tree = BIDSTree(TESTPATH1, initialize='lazy')
+    proj = tree.project('test1')
+    assert proj._subjects.loaded_values() == []
+    subj = proj.subject('1')
+    assert proj._subjects.loaded_values() == [subj]
+    assert subj._sessions.loaded_values() == []
+    sess = subj.session('1')
+    assert sess._lazy
+    assert len(sess.scans) == 2
+    assert not sess._lazy
+    # Once everything is accessed the tree is the same as a full load.
+    lazy_tree = BIDSTree(TESTPATH1, initialize='lazy')
+    assert lazy_tree.generate_map() == BIDSTree(TESTPATH1).generate_map()
+    assert (len(lazy_tree.query('scan', 'task', '=', 'resting')) ==
+            len(tree.query('scan', 'task', '=', 'resting')))
+
+
+def test_sidecar_loading():
+    # Sidecars should only be read when the scan information is requested.
+    tree = BIDSTree(TESTPATH1)
+    scans = tree.scans
+    tree.generate_map()
+    for scan in scans:
+        scan.contained_files()
+    assert all(scan._info is None for scan in scans)
+    scan = scans[0]
+    assert scan.info.get('TaskName') == scan.task
+    assert scan._info is not None
+    # The sidecar information is shared so can't be changed.
+    with pytest.raises(TypeError):
+        scan.info['TaskName'] = 'other'
+
+
+def test_compact_scans():
+    # Scans don't have a __dict__ and share their entity strings.
+    tree = BIDSTree(TESTPATH1)
+    scans = tree.project('test1').scans
+    assert not hasattr(scans[0], '__dict__')
+    tasks = dict()
+    for scan in scans:
+        assert tasks.setdefault(scan.task, scan.task) is scan.task
+    # Changing the returned dictionary doesn't change the scan.
+    scan = scans[0]
+    files = scan.associated_files
+    assert files['channels'] == op.relpath(scan.channels_tsv, scan.path)
+    files['channels'] = 'other.tsv'
+    assert scan.associated_files['channels'] != 'other.tsv'
+    assert scan.acquisition == scan.acq
+
+
+def test_no_scans_tsv():
+    # Test loading the scans of a session without a scans.tsv.
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(op.join(tmp, 'test', 'sub-1', 'ses-1', 'fmap'))
+        with open(op.join(tmp, 'test', 'participants.tsv'), 'w') as f:
+            f.write('participant_id\nsub-1\n')
+        for fname in ('fmap/sub-1_ses-1_phasediff.nii',
+                      'fmap/sub-1_ses-1_magnitude1.nii',
+                      'sub-1_ses-1_T1w.nii'):
+            open(op.join(tmp, 'test', 'sub-1', 'ses-1', fname), 'w').close()
+        scans = BIDSTree(tmp).project('test').subject(1).session(1).scans
+        assert [scan.raw_file_relative for scan in scans] == [
+            op.join('fmap', 'sub-1_ses-1_phasediff.nii'),
+            op.join('fmap', 'sub-1_ses-1_magnitude1.nii')]
+
+
+def test_folder_listing(monkeypatch):
+    # Each folder should only be read once when the scans are loaded.
+    import bidshandler.dircache
+    read_folders = []
+
+    def _counting_scandir(folder):
+        read_folders.append(folder)
+        return _scandir(folder)
+    _scandir = bidshandler.dircache._scandir
+    monkeypatch.setattr(bidshandler.dircache, '_scandir', _counting_scandir)
+    tree = BIDSTree(TESTPATH1)
+    assert len(read_folders) == len(set(read_folders))
+    assert len(tree.scans) == 6
+    # The folders aren't read again when the associated files are needed.
+    del read_folders[:]
+    for scan in tree.scans:
+        scan.associated_files
+        scan.contained_files()
+    assert read_folders == []
+
+
+def test_index():
+    # Test saving an index and loading a folder from it.
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copytree(TESTPATH1, op.join(tmp, 'BIDSTEST1'))
+        index = op.join(tmp, 'index.json')
+        bt = BIDSTree(op.join(tmp, 'BIDSTEST1'), index=index)
+        bt.save_index(index)
+        indexed = BIDSTree(op.join(tmp, 'BIDSTEST1'), index=index)
+        assert indexed.generate_map() == bt.generate_map()
+        scan = indexed.project('test1').subject(1).session(1).scan(
+            task='resting', run='1')
+        # The sidecar is loaded from the index.
+        assert scan._info is not None
+        assert scan.info == bt.project('test1').subject(1).session(1).scan(
+            task='resting', run='1').info
+        # Any changed sessions are loaded from the folder again.
+        indexed.project('test1').subject(1).session(1).scan(
+            task='optimumMMN', run='1').delete()
+        reloaded = BIDSTree(op.join(tmp, 'BIDSTEST1'), index=index)
+        assert len(reloaded.project('test1').subject(1).session(1).scans) == 1
+        assert reloaded.project('test1').subject(1).session(1).scans[0]._info \
+            is None
+        assert reloaded.project('test1').subject(2).scans[0]._info is not None
+
+
+def test_refresh():
+    # Test that changes to the folder are picked up.
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copytree(TESTPATH1, op.join(tmp, 'BIDSTEST1'))
+        bt = BIDSTree(op.join(tmp, 'BIDSTEST1'))
+        assert not bt.refresh()
+        # Remove a session and add a new project.
+        shutil.rmtree(bt.project('test1').subject(1).session(2).path)
+        shutil.copytree(op.join(TESTPATH1, 'test2'),
+                        op.join(tmp, 'BIDSTEST1', 'test3'))
+        subject = bt.project('test1').subject(2)
+        assert bt.refresh()
+        assert bt.project('test1').subject(2) is subject
+        with pytest.raises(NoSessionError):
+            bt.project('test1').subject(1).session(2)
+        assert bt.project('test3').subject(3)
+        assert bt.generate_map() == BIDSTree(
+            op.join(tmp, 'BIDSTEST1')).generate_map()
+
+
+def test_refresh_after_add(monkeypatch):
+    # Test that adding a session doesn't reload the other sessions.
+    reloaded = []
+    _reload = Session._reload
+
+    def _counting_reload(session):
+        reloaded.append(session)
+        _reload(session)
+    monkeypatch.setattr(Session, '_reload', _counting_reload)
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copytree(TESTPATH2, op.join(tmp, 'BIDSTEST2'))
+        bt = BIDSTree(op.join(tmp, 'BIDSTEST2'))
+        subject = bt.project('test1').subject(1)
+        subject.add(BIDSTree(TESTPATH1).project('test1').subject(1).session(2))
+        assert bt.refresh()
+        assert reloaded == []
+        assert len(subject.sessions) == 2
+
+
+def test_refresh_emptied_session():
+    # Test refreshing a session which is part way through being rewritten.
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copytree(TESTPATH1, op.join(tmp, 'BIDSTEST1'))
+        bt = BIDSTree(op.join(tmp, 'BIDSTEST1'))
+        ses_path = bt.project('test1').subject(1).session(2).path
+        os.mkdir(op.join(tmp, 'ses-2'))
+        for fname in os.listdir(ses_path):
+            shutil.move(op.join(ses_path, fname), op.join(tmp, 'ses-2'))
+        shutil.copytree(op.join(TESTPATH1, 'test2'),
+                        op.join(tmp, 'BIDSTEST1', 'test3'))
+        # The empty session is removed and the rest of the tree refreshed.
+        assert bt.refresh()
+        with pytest.raises(NoSessionError):
+            bt.project('test1').subject(1).session(2)
+        assert bt.project('test3').subject(3)
+        # The session is loaded again once it has been rewritten.
+        for fname in os.listdir(op.join(tmp, 'ses-2')):
+            shutil.move(op.join(tmp, 'ses-2', fname), ses_path)
+        assert bt.refresh()
+        assert len(bt.project('test1').subject(1).session(2).scans) == 1
+        assert bt.generate_map() == BIDSTree(
+            op.join(tmp, 'BIDSTEST1')).generate_map()
+
+
+@pytest.mark.parametrize('use_inotify', [True, False])
+def test_watch(use_inotify):
+    # Test that changes are picked up by a watcher.
+    if use_inotify:
+        try:
+            _Inotify().close()
+        except OSError:
+            pytest.skip('inotify is not available')
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copytree(TESTPATH1, op.join(tmp, 'BIDSTEST1'))
+        bt = BIDSTree(op.join(tmp, 'BIDSTEST1'))
+        changes = Queue()
+        with bt.watch(interval=0.1, callback=changes.put,
+                      use_inotify=use_inotify) as watcher:
+            assert watcher.uses_inotify == use_inotify
+            # Give the watcher time to start watching the folders.
+            time.sleep(0.5)
+            shutil.rmtree(bt.project('test1').subject(1).session(2).path)
+            changed = changes.get(timeout=10)
+            if use_inotify:
+                # Only the affected subject is refreshed.
+                assert len(changed) == 1
+                assert changed[0] is bt.project('test1').subject(1)
+            with watcher.lock:
+                with pytest.raises(NoSessionError):
+                    bt.project('test1').subject(1).session(2)
+        assert not watcher.running
+
+
+def test_watch_removed_folder():
+    # Test watching a tree with a loaded folder which has been removed.
+    try:
+        _Inotify().close()
+    except OSError:
+        pytest.skip('inotify is not available')
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copytree(TESTPATH1, op.join(tmp, 'BIDSTEST1'))
+        bt = BIDSTree(op.join(tmp, 'BIDSTEST1'))
+        shutil.rmtree(bt.project('test1').subject(1).session(2).path)
+        with bt.watch(interval=0.1, use_inotify=True) as watcher:
+            time.sleep(0.5)
+            assert watcher.running
+            # The remaining folders are still watched.
+            with watcher.lock:
+                assert op.normpath(
+                    bt.project('test1').subject(1).path) in watcher._objects
+
+
 def test_large_dataset():
     # Test loading the bids-example dataset.
     tree = BIDSTree(TESTPATH3)
@@ -1,10 +1,17 @@
 # test the query functionality
 
 import pytest
+import os
 import os.path as op
+import json
+import shutil
+import tempfile
+from datetime import datetime
 
 from bidshandler import BIDSTree
+from bidshandler.querylist import QueryList, QueryIterator
 from bidshandler.constants import test_path
+from bidshandler.utils import _compare
 
 TESTPATH1 = op.join(test_path(), 'BIDSTEST1')
 
@@ -28,8 +35,12 @@ def test_query():
     assert (folder.project('test1').subject('1') in
             folder.query('subject', 'task', '!=', 'resting'))
     # ask if any of the subjects have not got a task called 'resting'
-    assert (folder.project('test1').subject('2') in
-            folder.query('subject', 'task', '!!=', 'resting'))
+    subjs = folder.query('subject', 'task', '!!=', 'resting')
+    assert folder.project('test1').subject('2') in subjs
+    # Every subject without the task is returned exactly once.
+    has_subjs = folder.query('subject', 'task', '=', 'resting')
+    assert list(subjs) == [subj for subj in folder.subjects if
+                           subj not in has_subjs]
     with pytest.raises(ValueError, match='Condition'):
         folder.query('subject', 'task', '>', 'resting')
 
@@ -103,3 +114,235 @@ def test_query():
     assert len(sesss) == 4
     assert (folder.project('test2').subject('3').session('1') in
             sesss.query('session', 'TaskName', '=', 'resting'))
+
+
+def test_query_clauses():
+    folder = BIDSTree(TESTPATH1)
+    clauses = [('age', '>=', 2), ('task', '=', 'resting'),
+               ('sessions', '>=', 1), ('task', '!!=', 'noise')]
+    # The same as chaining the queries.
+    chained = folder.query('subject', *clauses[0])
+    for clause in clauses[1:]:
+        chained = chained.query('subject', *clause)
+    subjs = folder.query('subject', clauses)
+    assert len(subjs) != 0
+    assert list(subjs) == list(chained)
+    # The objects satisfying any clause in the order they are contained.
+    data = folder.query('scan', [('task', '=', 'resting'), ('run', '=', '1')],
+                        combine='or')
+    assert list(data) == [
+        scan for scan in folder.scans if
+        scan in folder.query('scan', 'task', '=', 'resting') or
+        scan in folder.query('scan', 'run', '=', '1')]
+    assert len(folder.query('subject', [('age', '>', 100)] + clauses)) == 0
+    with pytest.raises(ValueError, match='combine'):
+        folder.query('subject', clauses, combine='xor')
+    with pytest.raises(ValueError, match='clauses'):
+        folder.query('subject', [])
+
+
+def test_query_cache():
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copytree(TESTPATH1, op.join(tmp, 'BIDSTEST1'))
+        folder = BIDSTree(op.join(tmp, 'BIDSTEST1'))
+        data = folder.query('scan', 'task', '=', 'resting')
+        # Repeated queries return a new list of the cached results.
+        data.clear()
+        data = folder.query('scan', 'task', '=', 'resting')
+        assert len(data) == 2
+        assert folder.query('scan', 'task', '=', 'resting') is not data
+        assert len(folder._query_cache[1]) == 1
+        # Equal values of different types are cached separately.
+        assert len(folder.query('subject', 'sessions', '=', 1)) != 0
+        assert len(folder.query('subject', 'sessions', '=', True)) != 0
+        assert len(folder._query_cache[1]) == 3
+        # Cached results are never used once the scans have changed.
+        data[0].delete()
+        assert len(folder.query('scan', 'task', '=', 'resting')) == 1
+        assert len(folder._query_cache[1]) == 1
+        folder.query('subject', 'task', '=', 'resting')
+        folder.project('test1').subject(2).rename('4')
+        folder.query('subject', 'task', '=', 'resting')
+        assert len(folder._query_cache[1]) == 1
+
+
+def test_querylist():
+    folder = BIDSTree(TESTPATH1)
+    project = folder.project('test1')
+    subject = project.subject(1)
+    # Scans found by querying both the project and subject are only included
+    # once.
+    data = QueryList([project, subject]).query('scan', 'task', '!=', None)
+    assert list(data) == project.scans
+    assert data.exists() and data.first() is project.scans[0]
+    assert not QueryList().exists() and QueryList().first() is None
+
+    # Results are only found as they are needed.
+    queried = []
+
+    class Recorder():
+        def __init__(self, bids_obj):
+            self.bids_obj = bids_obj
+
+        def query(self, *args):
+            queried.append(self.bids_obj)
+            return self.bids_obj.query(*args)
+
+    sessions = QueryList(Recorder(session) for session in folder.sessions)
+    scans = sessions.iter_query('scan', 'task', '!=', None)
+    assert isinstance(scans, QueryIterator)
+    assert scans.first() is folder.scans[0]
+    assert queried == folder.sessions[:1]
+    assert (list(scans.iter_query('scan', 'run', '!=', 'x')) ==
+            folder.scans[1:])
+    assert not scans.exists()
+    # Checking whether there are any results doesn't consume the next one.
+    scans = QueryList(folder.sessions).iter_query('scan', 'task', '!=', None)
+    assert scans.exists() and scans.exists()
+    assert list(scans) == folder.scans
+
+
+def test_query_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copytree(TESTPATH1, op.join(tmp, 'BIDSTEST1'))
+        folder = BIDSTree(op.join(tmp, 'BIDSTEST1'))
+        project = folder.project('test1')
+        objects = {'project': folder.projects, 'subject': folder.subjects,
+                   'session': folder.sessions}
+
+        def expected(obj, token, condition, value):
+            # Find the objects without using the index.
+            def matches(scan):
+                return (getattr(scan, token) == value) == (condition == '=')
+            if obj == 'scan':
+                return [scan for scan in folder.scans if matches(scan)]
+            return [ob for ob in objects[obj] if
+                    any(matches(scan) for scan in ob.scans)]
+
+        tasks = set(scan.task for scan in folder.scans)
+        for obj in ('project', 'subject', 'session', 'scan'):
+            for token in ('task', 'run', 'acq'):
+                values = set(getattr(scan, token) for scan in folder.scans)
+                for value in values | {'missing'}:
+                    for condition in ('=', '!='):
+                        assert (list(folder.query(obj, token, condition,
+                                                  value)) ==
+                                expected(obj, token, condition, value))
+        assert (list(project.query('scan', 'task', '=', 'resting')) ==
+                [scan for scan in project.scans if scan.task == 'resting'])
+        assert (folder.query('scan', 'acquisition', '=', None) ==
+                folder.query('scan', 'acq', '=', None))
+
+        # The index is updated when scans are removed.
+        task = sorted(tasks)[0]
+        n_scans = len(folder.query('scan', 'task', '=', task))
+        folder.query('scan', 'task', '=', task)[0].delete()
+        assert len(folder.query('scan', 'task', '=', task)) == n_scans - 1
+        assert (len(project.query('scan', 'task', '!=', task)) ==
+                len(project.scans) - n_scans + 1)
+
+
+def test_query_participants():
+    folder = BIDSTree(TESTPATH1)
+    ages = sorted(set(subject.subject_data['age'] for subject in
+                      folder.subjects if 'age' in subject.subject_data))
+    for value in (ages[0], ages[-1], float(ages[0]) + 0.5):
+        for condition in ('<', '<=', '=', '>=', '>', '!='):
+            expected = [subject for subject in folder.subjects if
+                        subject.subject_data.get('age') is not None and
+                        _compare(subject.subject_data['age'], condition,
+                                 value)]
+            if len(expected) != 0:
+                assert (list(folder.query('subject', 'age', condition,
+                                          value)) == expected)
+    # Only columns of numbers are compared all at once.
+    index = folder._current_query_index()
+    assert index.participant_query('sex', '=', 1) is None
+    assert index.participant_query('age', '=', 'M') is None
+    assert index.participant_query('age', '=', 2 ** 60) is None
+
+
+def test_query_rec_date_index():
+    folder = BIDSTree(TESTPATH1)
+    objects = {'project': folder.projects, 'subject': folder.subjects,
+               'session': folder.sessions}
+    acq_times = sorted(set(scan.acq_time for scan in folder.scans))
+    values = [acq_times[0], acq_times[-1], acq_times[0][:10],
+              '2000-01-01', '2100-01-01']
+    for obj in ('project', 'subject', 'session', 'scan'):
+        for value in values:
+            for condition in ('<', '<=', '=', '>=', '>', '!='):
+                # Find the objects by comparing each scan separately.
+                expected = []
+                for ob in objects.get(obj, folder.scans):
+                    for scan in ob.scans:
+                        scan_data = scan.session.query('scan', 'rec_date',
+                                                       condition, value)
+                        if scan in scan_data:
+                            expected.append(ob)
+                            break
+                assert (list(folder.query(obj, 'rec_date', condition,
+                                          value)) == expected)
+
+
+def test_query_sidecar_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copytree(TESTPATH1, op.join(tmp, 'BIDSTEST1'))
+        folder = BIDSTree(op.join(tmp, 'BIDSTEST1'))
+        objects = {'project': folder.projects, 'subject': folder.subjects,
+                   'session': folder.sessions}
+
+        def expected(obj, key, condition, value):
+            # Find the objects by querying each session separately.
+            data = []
+            for ob in objects.get(obj, folder.scans):
+                for scan in ob.scans:
+                    if scan in scan.session.query('scan', key, condition,
+                                                  value):
+                        data.append(ob)
+                        break
+            return data
+
+        scan = folder.scans[0]
+        for key in ('PowerLineFrequency', 'TaskName', 'Manufacturer'):
+            value = scan.info.get(key)
+            if value is None:
+                continue
+            conditions = ['=', '!=']
+            if isinstance(value, (int, float)):
+                conditions.extend(['<', '<=', '>', '>='])
+            for obj in ('project', 'subject', 'session', 'scan'):
+                for condition in conditions:
+                    assert (list(folder.query(obj, key, condition, value)) ==
+                            expected(obj, key, condition, value))
+
+        # Changing a sidecar drops the index once the tree is refreshed.
+        assert scan not in folder.query('scan', 'TaskName', '=', 'changed')
+        info = dict(scan.info)
+        info['TaskName'] = 'changed'
+        with open(scan.sidecar, 'w') as f:
+            json.dump(info, f)
+        mtime = op.getmtime(scan.sidecar) + 10
+        os.utime(scan.sidecar, (mtime, mtime))
+        assert folder.refresh()
+        assert scan in folder.query('scan', 'TaskName', '=', 'changed')
+
+
+def test_to_table():
+    folder = BIDSTree(TESTPATH1)
+    table = folder.to_table(sidecar_keys=['TaskName'])
+    assert list(table.keys()) == ['project', 'subject', 'session', 'modality',
+                                  'task', 'run', 'acq_time', 'raw_file',
+                                  'age', 'sex', 'group', 'TaskName']
+    scans = folder.scans
+    assert all(len(column) == len(scans) for column in table.values())
+    assert table['raw_file'] == [scan.raw_file for scan in scans]
+    assert table['task'] == table['TaskName']
+    assert all(isinstance(acq_time, datetime) for acq_time in
+               table['acq_time'])
+    # Table of a single Session.
+    subject = folder.project('test1').subject(1)
+    session = subject.session(1)
+    table = session.to_table()
+    assert table['session'] == ['ses-1'] * len(session.scans)
+    assert table['age'] == [subject.subject_data['age']] * len(session.scans)
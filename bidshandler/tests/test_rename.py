@@ -48,3 +48,22 @@ def test_rename():
         orig_path = sess.path
         sess.rename('1')
         assert sess.path == op.join(orig_path, 'ses-1')
+
+
+def test_rename_paths():
+    # The cached paths of all the contained objects are updated.
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copytree(TESTPATH1, op.join(tmp, 'BIDSTEST1'))
+        src_bt = BIDSTree(op.join(tmp, 'BIDSTEST1'))
+        subj = src_bt.project('test1').subject(2)
+        scans = subj.scans
+        old_paths = [scan.raw_file for scan in scans]
+        subj.rename('4')
+        for scan, old_path in zip(scans, old_paths):
+            assert scan.raw_file == old_path.replace('sub-2', 'sub-4')
+            assert op.exists(scan.raw_file)
+            assert scan.path.startswith(subj.path)
+        # Moving the whole folder.
+        shutil.move(op.join(tmp, 'BIDSTEST1'), op.join(tmp, 'moved'))
+        src_bt.path = op.join(tmp, 'moved')
+        assert all(op.exists(scan.raw_file) for scan in src_bt.scans)
@@ -2,10 +2,14 @@ import pytest
 from datetime import datetime
 import tempfile
 import os.path as op
+import math
+import os
+from collections import OrderedDict
 
 from bidshandler.utils import (_get_bids_params, _bids_params_are_subsets,
                                _compare, _compare_times, download_test_data,
-                               _multi_replace)
+                               _multi_replace, _read_tsv, _combine_tsv,
+                               _remove_tsv_rows, _load_json, _parse_bids_name)
 
 
 def test_download_test_data():
@@ -34,6 +38,18 @@ def test_bids_params():
     # Check for when the two bids parameters are disjoint sets.
     split_fname4 = _get_bids_params('run-1_acq-test_meg.json')
     assert not _bids_params_are_subsets(split_fname3, split_fname4)
+    # The parsed names give the same results.
+    names = [_parse_bids_name(fname) for fname in
+             [fname1, 'sub-1_ses-1_headshape.elp',
+              'sub-1_ses-2_headshape.elp', 'run-1_acq-test_meg.json']]
+    assert dict(names[0].params) == split_fname1
+    assert names[1].entities <= names[0].entities
+    assert not names[2].entities <= names[0].entities
+    assert not names[3].entities <= names[2].entities
+    # Parsed names are shared and can't be modified.
+    assert _parse_bids_name(fname1) is names[0]
+    with pytest.raises(TypeError):
+        names[0].params['sub'] = '2'
 
 
 def test__compare():
@@ -70,3 +86,59 @@ def test__multi_replace():
     assert new == 'this_is_a_test'
     new = _multi_replace(orig, [' ', 's', 'tezt'], ['_', 'z', 'thing'])
     assert new == 'thiz_iz_a_thing'
+
+
+def test__read_tsv():
+    with tempfile.TemporaryDirectory() as tmp:
+        fname = op.join(tmp, 'test.tsv')
+        with open(fname, 'w') as f:
+            f.write('filename\tage\trun\tflag\tnotes\n')
+            f.write('a.con\t20\t1\tTrue\tn/a\n')
+            f.write('b.con\tn/a\t2\tFalse\tgood\n')
+        data = _read_tsv(fname)
+    assert list(data.keys()) == ['filename', 'age', 'run', 'flag', 'notes']
+    assert data['filename'] == ['a.con', 'b.con']
+    # Columns of ints with missing values are floats.
+    assert data['age'][0] == 20.0 and isinstance(data['age'][0], float)
+    assert math.isnan(data['age'][1])
+    assert data['run'] == [1, 2]
+    assert data['flag'] == [True, False]
+    assert math.isnan(data['notes'][0])
+    assert data['notes'][1] == 'good'
+
+
+def test__combine_tsv():
+    with tempfile.TemporaryDirectory() as tmp:
+        fname = op.join(tmp, 'test.tsv')
+        with open(fname, 'w') as f:
+            f.write('filename\tacq_time\n')
+            f.write('a.con\t2018-10-26T10:00:00\n')
+            f.write('b.con\tN/A\n')
+        _combine_tsv(fname, OrderedDict([('filename', ['b.con', 'c.con']),
+                                         ('notes', [float('nan'), 'new'])]),
+                     'filename')
+        with open(fname) as f:
+            assert f.read() == ('filename\tacq_time\tnotes\n'
+                                'a.con\t2018-10-26T10:00:00\tn/a\n'
+                                'b.con\tn/a\tn/a\n'
+                                'c.con\tn/a\tnew\n')
+        _remove_tsv_rows(fname, 'filename', 'b.con')
+        filenames = _read_tsv(fname, convert=False)['filename']
+        assert filenames == ['a.con', 'c.con']
+
+
+def test__load_json():
+    with tempfile.TemporaryDirectory() as tmp:
+        fname = op.join(tmp, 'task-test_meg.json')
+        with open(fname, 'w') as f:
+            f.write('{"TaskName": "test"}')
+        data, mtime = _load_json(fname)
+        assert data['TaskName'] == 'test'
+        with pytest.raises(TypeError):
+            data['TaskName'] = 'other'
+        # The same object is returned until the file changes.
+        assert _load_json(fname)[0] is data
+        with open(fname, 'w') as f:
+            f.write('{"TaskName": "other"}')
+        os.utime(fname, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+        assert _load_json(fname)[0]['TaskName'] == 'other'
@@ -1,15 +1,65 @@
 import os.path as op
 import os
+import sys
 import shutil
 from datetime import datetime, date
 import zipfile
 import urllib.request
 import tempfile
-
-import pandas as pd
+import csv
+import json
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from threading import Lock
+from types import MappingProxyType
 
 from .constants import test_path
 
+# The sub-directories and files contained within a folder.
+_DirListing = namedtuple('_DirListing', ['dirs', 'files'])
+
+# Values which are considered missing in a tsv file. These are the same values
+# that are considered missing by `pandas.read_csv`.
+_NA_VALUES = {'', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN',
+              '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN',
+              'n/a', 'nan', 'null'}
+
+# Formats of the acq_time column of a scans.tsv.
+_ACQ_TIME_FORMATS = ('%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%d')
+
+# A parsed BIDS file name.
+# `params` is a read-only mapping of the file type (`file`), extension (`ext`)
+# and entities of the name, the same as returned by `_get_bids_params`.
+# `entities` is the frozenset of the (key, value) pairs of just the entities
+# so that whether a name has all the entities of another can be checked with
+# `<=`.
+_BIDSName = namedtuple('_BIDSName', ['params', 'entities'])
+
+# Maximum number of parsed file names kept by `_parse_bids_name`.
+_BIDS_NAME_CACHE_SIZE = 65536
+
+# Maximum number of parsed json files kept by `_load_json`.
+_JSON_CACHE_SIZE = 256
+# Parsed json files keyed by path and modification time, with the most
+# recently used file last.
+_JSON_CACHE = OrderedDict()
+_JSON_CACHE_LOCK = Lock()
+
+# Incremented whenever the folder of any loaded object may have changed (eg.
+# when an object is renamed). Cached paths are only used if they were found
+# during the current generation.
+_PATH_GENERATION = [0]
+
+# Incremented whenever Scans may have been added to, removed from or changed
+# within any loaded object (eg. when an object is added, deleted, renamed or
+# refreshed). Query indexes are only used if they were built during the
+# current generation.
+_QUERY_GENERATION = [0]
+
+# Shared instances of the tuples passed to `_intern`.
+_TUPLE_TABLE = dict()
+
 
 #region public functions
 
@@ -92,13 +142,35 @@ def _bids_params_are_subsets(params1, params2):
     return False
 
 
-def _combine_tsv(tsv, df, drop_column=None):
-    """Merge a df into a tsv file"""
-    orig_df = pd.read_csv(tsv, sep='\t')
-    orig_df = orig_df.append(df, sort=False)
+def _combine_tsv(tsv, data, drop_column=None):
+    """Merge some new rows into a tsv file.
+
+    Parameters
+    ----------
+    tsv : str
+        Path to the tsv file.
+    data : :py:class:`collections.OrderedDict`
+        Lists of the values of the new rows keyed by column name. Any columns
+        not already in the file are added to the end.
+    drop_column : str, optional
+        If provided, only the last row with each value in this column is
+        kept.
+    """
+    columns = _read_tsv(tsv, convert=False)
+    n_rows = len(next(iter(columns.values()), []))
+    n_new = len(next(iter(data.values()), []))
+    for col_name in data:
+        if col_name not in columns:
+            columns[col_name] = [''] * n_rows
+    for col_name, values in columns.items():
+        values.extend(data.get(col_name, [''] * n_new))
     if drop_column is not None:
-        orig_df.drop_duplicates(subset=drop_column, keep='last', inplace=True)
-    orig_df.to_csv(tsv, sep='\t', index=False, na_rep='n/a', encoding='utf-8')
+        last_row = dict((value, i) for i, value in
+                        enumerate(columns[drop_column]))
+        keep = sorted(last_row.values())
+        columns = OrderedDict((col_name, [values[i] for i in keep]) for
+                              col_name, values in columns.items())
+    _write_tsv(tsv, columns)
 
 
 def _compare(val1, conditional, val2):
@@ -146,6 +218,38 @@ def _compare_times(time1, conditional, time2):
             raise TypeError
 
 
+def _convert_tsv_column(values):
+    """Convert the values in a column of a tsv file to the appropriate type.
+
+    Parameters
+    ----------
+    values : list of str
+        Values as read from the file.
+
+    Returns
+    -------
+    list
+        The values as ints, floats or bools if they can all be converted,
+        otherwise as strings. Missing values are `nan`. As with
+        `pandas.read_csv`, a column of ints with missing values is converted
+        to floats.
+    """
+    missing = [value in _NA_VALUES for value in values]
+    present = [value for value, is_na in zip(values, missing) if not is_na]
+    for converter in (_str_to_int, _str_to_float, _str_to_bool):
+        try:
+            converted = [converter(value) for value in present]
+        except ValueError:
+            continue
+        if converter is _str_to_int and len(present) != len(values):
+            converted = [float(value) for value in converted]
+        break
+    else:
+        converted = present
+    converted = iter(converted)
+    return [float('nan') if is_na else next(converted) for is_na in missing]
+
+
 def _copyfiles(src_files, dst_files):
     """
     Copy a list of files to a list of destinations.
@@ -181,15 +285,131 @@ def _fix_folderless(session, fname, old_sess_id, old_subj_id):
 
 
 def _get_bids_params(fname):
-    filename, ext = op.splitext(fname)
-    f = filename.split('_')
-    data = {'ext': ext}
-    for i in f:
-        if '-' in i:
-            data[i.split('-')[0]] = i.split('-')[1]
-        else:
-            data['file'] = i
-    return data
+    """Dictionary of the file type, extension and entities of a file name.
+
+    This is a new copy which may be modified. Use `_parse_bids_name` where
+    the parameters only need to be read.
+    """
+    return dict(_parse_bids_name(fname).params)
+
+
+def _intern(value):
+    """Shared instance of a string or a tuple of strings.
+
+    Values such as the entities of file names are repeated for a large number
+    of scans. Interning them means each distinct value is only stored once.
+
+    Parameters
+    ----------
+    value : str | tuple of str | None
+        Value to intern.
+
+    Returns
+    -------
+    str | tuple of str | None
+        An object equal to `value` which is shared with every other call
+        with an equal value.
+    """
+    if value is None:
+        return None
+    if isinstance(value, tuple):
+        value = tuple(_intern(item) for item in value)
+        return _TUPLE_TABLE.setdefault(value, value)
+    return sys.intern(value)
+
+
+def _invalidate_paths():
+    """Stop any currently cached paths of objects from being used."""
+    _PATH_GENERATION[0] += 1
+
+
+def _invalidate_queries():
+    """Stop any currently built query indexes from being used."""
+    _QUERY_GENERATION[0] += 1
+
+
+def _load_json(fname):
+    """Read a json file, sharing the contents with every other reader.
+
+    The parsed contents of the most recently read files are cached (keyed by
+    the path and modification time of each file) so that a file which is
+    read for a large number of objects, such as a sidecar inherited by many
+    Scans, is only parsed once for as long as it isn't changed.
+
+    Parameters
+    ----------
+    fname : str
+        Path to the json file.
+
+    Returns
+    -------
+    data : :py:class:`types.MappingProxyType`
+        Read-only view of the contents of the file. As it is shared it must
+        not be modified.
+    mtime : int | None
+        Modification time of the file when it was read.
+    """
+    fname = op.abspath(fname)
+    mtime = _mtime(fname)
+    key = (fname, mtime)
+    with _JSON_CACHE_LOCK:
+        data = _JSON_CACHE.get(key)
+        if data is not None:
+            _JSON_CACHE.move_to_end(key)
+            return data, mtime
+    with open(fname, 'r') as file:
+        data = json.load(file)
+    if isinstance(data, dict):
+        data = MappingProxyType(data)
+    with _JSON_CACHE_LOCK:
+        _JSON_CACHE[key] = data
+        while len(_JSON_CACHE) > _JSON_CACHE_SIZE:
+            _JSON_CACHE.popitem(last=False)
+    return data, mtime
+
+
+def _map_threaded(func, items, workers=None):
+    """Apply a function to every item, optionally using a pool of threads.
+
+    Parameters
+    ----------
+    func : function
+        Function to call on each item.
+    items : iterable
+        Values to pass to `func`.
+    workers : int, optional
+        Number of threads to use. If None or less than 2 the items are
+        processed one after the other in the current thread.
+
+    Returns
+    -------
+    list
+        Results of `func` in the same order as `items`.
+    """
+    if workers is None or workers < 2:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, items))
+
+
+def _mtime(path):
+    """Modification time of a file or folder.
+
+    Parameters
+    ----------
+    path : str
+        Path to the file or folder.
+
+    Returns
+    -------
+    int | None
+        The modification time in nanoseconds, or None if the path doesn't
+        exist.
+    """
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
 
 
 def _multi_replace(str_in, old, new):
@@ -218,6 +438,60 @@ def _multi_replace(str_in, old, new):
     return str_out
 
 
+def _parse_acq_time(acq_time):
+    """Convert the acquisition time of a scan to a datetime.
+
+    Parameters
+    ----------
+    acq_time : str | float | None
+        Value of the `acq_time` column of a scans.tsv.
+
+    Returns
+    -------
+    :py:class:`datetime.datetime` | None
+        The acquisition time, or None if it is missing or can't be parsed.
+    """
+    if not isinstance(acq_time, str):
+        return None
+    for fmt in _ACQ_TIME_FORMATS:
+        try:
+            return datetime.strptime(acq_time, fmt)
+        except ValueError:
+            pass
+    return None
+
+
+@lru_cache(maxsize=_BIDS_NAME_CACHE_SIZE)
+def _parse_bids_name(fname):
+    """Parse a BIDS file name.
+
+    The same file names are parsed many times while loading so the most
+    recently parsed names are cached.
+
+    Parameters
+    ----------
+    fname : str
+        Name of the file (without any folders).
+
+    Returns
+    -------
+    :py:class:`_BIDSName`
+        The parsed name. This is shared with every other caller so is
+        read-only.
+    """
+    filename, ext = op.splitext(fname)
+    params = {'ext': ext}
+    for item in filename.split('_'):
+        key, sep, value = item.partition('-')
+        if sep:
+            params[key] = value.partition('-')[0]
+        else:
+            params['file'] = item
+    entities = frozenset(params.items()).difference(
+        (('ext', ext), ('file', params.get('file'))))
+    return _BIDSName(MappingProxyType(params), entities)
+
+
 def _prettyprint_xml(xml_str):
     """Take a flat string representation of xml data and pretty print it."""
     curr_indent = 0
@@ -251,6 +525,41 @@ def _prettyprint_xml(xml_str):
     return ''.join(return_data)
 
 
+def _read_tsv(fname, convert=True):
+    """Read a tsv file into a dictionary of columns.
+
+    Parameters
+    ----------
+    fname : str
+        Path to the tsv file.
+    convert : bool, optional
+        Whether to convert the values from strings. If False the values are
+        returned exactly as they are in the file.
+
+    Returns
+    -------
+    :py:class:`collections.OrderedDict`
+        Lists of the values in each column keyed by the column names in the
+        header. If `convert` is True the values are converted to the same
+        types as `pandas.read_csv` would give them.
+    """
+    with open(fname, 'r', newline='', encoding='utf-8') as tsv:
+        reader = csv.reader(tsv, delimiter='\t')
+        header = next(reader, [])
+        columns = [[] for _ in header]
+        for row in reader:
+            if not row:
+                # Skip blank lines.
+                continue
+            row.extend([''] * (len(header) - len(row)))
+            for column, value in zip(columns, row):
+                column.append(value)
+    if not convert:
+        return OrderedDict(zip(header, columns))
+    return OrderedDict((name, _convert_tsv_column(column)) for name, column in
+                       zip(header, columns))
+
+
 # This could possibly be a method for the classes? If they become subclassed
 # it would only need to be defined for the base class.
 # this could also be a decorator taking the instance of the class as an arg
@@ -273,11 +582,59 @@ def _realize_paths(obj, rel_paths):
     return op.normpath(op.join(obj.path, rel_paths))
 
 
+def _remove_tsv_rows(tsv, col_name, value):
+    """Remove every row of a tsv file which has a value in a column.
+
+    Parameters
+    ----------
+    tsv : str
+        Path to the tsv file.
+    col_name : str
+        Name of the column to check.
+    value : str
+        Value of the rows to remove.
+    """
+    columns = _read_tsv(tsv, convert=False)
+    keep = [i for i, row_value in enumerate(columns[col_name]) if
+            row_value != value]
+    _write_tsv(tsv, OrderedDict((name, [values[i] for i in keep]) for
+                                name, values in columns.items()))
+
+
 def _reformat_fname(fname):
     """Change all the path separators in a file path to `/`"""
     return fname.replace(os.sep, '/')
 
 
+def _scandir(folder):
+    """Split the contents of a folder into its sub-directories and files.
+
+    The folder is read once with :py:func:`os.scandir` and the type of each
+    entry is taken from the returned :py:class:`os.DirEntry` so that no
+    extra ``stat`` call is needed per entry.
+
+    Parameters
+    ----------
+    folder : str
+        Path to the folder to read.
+
+    Returns
+    -------
+    :py:class:`_DirListing`
+        Named tuple with the lists of the names of the sub-directories
+        (`dirs`) and all other entries (`files`) within the folder.
+    """
+    dirs = []
+    files = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                dirs.append(entry.name)
+            else:
+                files.append(entry.name)
+    return _DirListing(dirs, files)
+
+
 def _splitall(fpath):
     # credit: Trent Mick:
     # https://www.oreilly.com/library/view/python-cookbook/0596001673/ch04s16.html
@@ -300,3 +657,59 @@ def _splitall(fpath):
             fpath = parts[0]
             allparts.insert(0, parts[1])
     return allparts
+
+
+def _str_to_bool(value):
+    """Convert the string representation of a bool to a bool."""
+    if value in ('True', 'TRUE', 'true'):
+        return True
+    elif value in ('False', 'FALSE', 'false'):
+        return False
+    raise ValueError("{0} is not a bool".format(value))
+
+
+def _str_to_float(value):
+    """Convert a string to a float.
+
+    Unlike `float` this doesn't accept underscores between the digits.
+    """
+    if '_' in value:
+        raise ValueError("{0} is not a float".format(value))
+    return float(value)
+
+
+def _str_to_int(value):
+    """Convert a string to an int.
+
+    Unlike `int` this doesn't accept underscores between the digits.
+    """
+    if '_' in value:
+        raise ValueError("{0} is not an int".format(value))
+    return int(value)
+
+
+def _write_tsv(fname, columns):
+    """Write a dictionary of columns to a tsv file.
+
+    Parameters
+    ----------
+    fname : str
+        Path to the tsv file.
+    columns : :py:class:`collections.OrderedDict`
+        Lists of the values in each column keyed by the column names. Missing
+        values (None, `nan` or any of the strings considered missing when
+        reading) are written as `n/a`.
+    """
+    def _format(value):
+        if value is None or value != value:
+            return 'n/a'
+        value = str(value)
+        if value in _NA_VALUES:
+            return 'n/a'
+        return value
+
+    with open(fname, 'w', newline='', encoding='utf-8') as tsv:
+        writer = csv.writer(tsv, delimiter='\t', lineterminator='\n')
+        writer.writerow(columns.keys())
+        for row in zip(*columns.values()):
+            writer.writerow([_format(value) for value in row])
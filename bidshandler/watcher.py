@@ -0,0 +1,343 @@
+import os
+import os.path as op
+import sys
+import select
+import struct
+import ctypes
+import ctypes.util
+from threading import Thread, Event, RLock
+from warnings import warn
+
+from .bidserrors import MappingError
+
+# inotify flags (see `man 7 inotify`).
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_CLOEXEC = 0o2000000
+_IN_NONBLOCK = 0o4000
+
+# Events which may change the contents of a watched folder.
+_WATCH_MASK = (_IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO |
+               _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF |
+               _IN_ONLYDIR)
+
+# Header of each event read from an inotify file descriptor
+# (wd, mask, cookie, len).
+_EVENT_HEADER = struct.Struct('iIII')
+
+# How long to wait for any more events once one has been received so that a
+# number of changes (eg. a session being copied) are applied together.
+_SETTLE_TIME = 0.1
+
+
+class TreeWatcher():
+    """Keep a :class:`bidshandler.BIDSTree` in sync with its folder.
+
+    A background thread watches every loaded folder in the tree and refreshes
+    the Project, Subject or Session the folder belongs to whenever it
+    changes. On Linux inotify is used to be notified of changes as they
+    happen, otherwise (or if inotify isn't available) the whole tree is
+    refreshed at a regular interval.
+
+    Parameters
+    ----------
+    bids_tree : :class:`bidshandler.BIDSTree`
+        BIDSTree to keep in sync.
+    interval : float, optional
+        Number of seconds between each refresh of the tree when polling.
+        When using inotify this is how often any objects loaded since the
+        watcher was started (eg. lazily loaded subjects) start being
+        watched.
+    callback : function, optional
+        Function called with the list of refreshed objects which have
+        changed. This is called from the watcher thread.
+    use_inotify : bool | None, optional
+        Whether to use inotify. If None inotify is used if it is available.
+
+    Notes
+    -----
+    Any access to the tree while the watcher is running should be done while
+    holding :attr:`lock` to avoid seeing the tree part way through an update.
+    """
+    def __init__(self, bids_tree, interval=1.0, callback=None,
+                 use_inotify=None):
+        self.bids_tree = bids_tree
+        self.interval = interval
+        self.callback = callback
+        # Held while any changes are being made to the tree.
+        self.lock = RLock()
+
+        self._inotify = None
+        if use_inotify is not False:
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError):
+                if use_inotify:
+                    raise
+        # Watched folders and the objects to refresh when they change.
+        self._paths = dict()
+        self._objects = dict()
+
+        self._stop_event = Event()
+        self._thread = None
+
+#region public methods
+
+    def start(self):
+        """Start watching the tree in a background thread."""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, name='TreeWatcher',
+                              daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching the tree."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for wd in list(self._paths.keys()):
+            self._inotify.remove_watch(wd)
+        self._paths.clear()
+        self._objects.clear()
+
+#region private methods
+
+    def _apply(self, events):
+        """Refresh the objects affected by a number of inotify events.
+
+        Parameters
+        ----------
+        events : list of tuple
+            (watch descriptor, mask, name) of each event.
+        """
+        targets = dict()
+        for wd, mask, _ in events:
+            if mask & _IN_Q_OVERFLOW:
+                # Some events have been lost so check everything.
+                targets = {id(self.bids_tree): self.bids_tree}
+                break
+            path = self._paths.get(wd)
+            if path is None:
+                continue
+            if mask & _IN_IGNORED:
+                # The folder no longer exists. Its parent folder will also
+                # have received an event.
+                del self._paths[wd]
+                self._objects.pop(path, None)
+                continue
+            obj = self._objects.get(path)
+            if obj is not None:
+                targets[id(obj)] = obj
+        # Refreshing an object also refreshes all its children so only the
+        # highest level objects need to be refreshed.
+        targets = [obj for obj in targets.values() if not
+                   any(id(parent) in targets for parent in _parents(obj))]
+        self._refresh(targets)
+
+    def _refresh(self, targets):
+        """Refresh a number of objects and call the callback if required."""
+        changed = []
+        with self.lock:
+            for obj in targets:
+                try:
+                    if obj.refresh():
+                        changed.append(obj)
+                except (MappingError, OSError) as e:
+                    # The folder is probably part way through being changed.
+                    # It will be checked again when the next change occurs.
+                    warn("Unable to refresh {0}: {1}".format(obj, e))
+        if changed and self.callback is not None:
+            self.callback(changed)
+
+    def _run(self):
+        """Watch the tree until the watcher is stopped."""
+        if self._inotify is None:
+            while not self._stop_event.wait(self.interval):
+                self._try(self._refresh, [self.bids_tree])
+            return
+        while not self._stop_event.is_set():
+            with self.lock:
+                self._try(self._update_watches)
+            events = self._inotify.read_events(self.interval)
+            if not events:
+                continue
+            while True:
+                more_events = self._inotify.read_events(_SETTLE_TIME)
+                if not more_events:
+                    break
+                events.extend(more_events)
+            self._try(self._apply, events)
+
+    def _try(self, func, *args):
+        """Call a function, warning instead of raising if it fails.
+
+        This stops any unexpected error from ending the watcher thread.
+        """
+        try:
+            func(*args)
+        except Exception as e:
+            warn("Error in TreeWatcher.{0}: {1!r}".format(func.__name__, e))
+
+    def _update_watches(self):
+        """Watch all the loaded folders in the tree."""
+        objects = _watched_folders(self.bids_tree)
+        for wd, path in list(self._paths.items()):
+            if path not in objects:
+                self._inotify.remove_watch(wd)
+                del self._paths[wd]
+        removed = []
+        for path in objects:
+            if path not in self._objects:
+                try:
+                    self._paths[self._inotify.add_watch(path)] = path
+                except OSError:
+                    # The folder has been removed since it was loaded.
+                    removed.append(path)
+        for path in removed:
+            del objects[path]
+        self._objects = objects
+
+#region properties
+
+    @property
+    def running(self):
+        """Whether the watcher is currently running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def uses_inotify(self):
+        """Whether inotify is used to watch for changes."""
+        return self._inotify is not None
+
+#region class methods
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def __del__(self):
+        if self._inotify is not None:
+            self._inotify.close()
+
+
+class _Inotify():
+    """Minimal wrapper around the Linux inotify API."""
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is only available on Linux.")
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                    ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "Unable to initialise inotify.")
+
+    def add_watch(self, path):
+        """Watch a folder and return the watch descriptor."""
+        wd = self._add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def close(self):
+        """Close the inotify file descriptor."""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def read_events(self, timeout):
+        """Wait for events.
+
+        Parameters
+        ----------
+        timeout : float
+            Maximum number of seconds to wait for an event.
+
+        Returns
+        -------
+        list of tuple
+            (watch descriptor, mask, name) of each event.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        events = []
+        i = 0
+        while i + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, i)
+            i += _EVENT_HEADER.size
+            name = os.fsdecode(data[i:i + length].rstrip(b'\0'))
+            i += length
+            events.append((wd, mask, name))
+        return events
+
+    def remove_watch(self, wd):
+        """Stop watching a folder."""
+        self._rm_watch(self.fd, wd)
+
+
+def _parents(obj):
+    """All the parent objects of a BIDSTree, Project, Subject or Session."""
+    parents = []
+    for attr in ('subject', 'project', 'bids_tree'):
+        parent = getattr(obj, attr, None)
+        if parent is not None and parent is not obj:
+            parents.append(parent)
+    return parents
+
+
+def _watched_folders(bids_tree):
+    """Find the folders to watch in a BIDSTree.
+
+    Parameters
+    ----------
+    bids_tree : :class:`bidshandler.BIDSTree`
+        BIDSTree to find the loaded folders of.
+
+    Returns
+    -------
+    dict
+        The object to refresh when each folder changes, keyed by the path of
+        the folder.
+    """
+    folders = {op.normpath(bids_tree.path): bids_tree}
+    for project in bids_tree._projects.values():
+        folders[op.normpath(project.path)] = project
+        for subject in project._subjects.loaded_values():
+            folders[op.normpath(subject.path)] = subject
+            for session in subject._sessions.loaded_values():
+                # Sessions without a folder share the subject's folder.
+                folders.setdefault(op.normpath(session.path), session)
+                if session._lazy:
+                    continue
+                # The folders containing the recordings.
+                rec_folders = set(session.recording_types)
+                for scan in session._scans:
+                    rec_folders.add(op.dirname(scan.raw_file_relative))
+                for folder in rec_folders:
+                    folders[op.normpath(op.join(session.path,
+                                                folder))] = session
+    return folders